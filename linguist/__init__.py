@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
+from .context import override
+
 version = (0, 6, 0)
 
 __version__ = ".".join(map(str, version))
 
-__all__ = ["version"]
+__all__ = ["override", "version"]
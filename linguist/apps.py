@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from django.apps import AppConfig
+
+
+class LinguistConfig(AppConfig):
+    name = "linguist"
+    verbose_name = "Linguist"
+
+    def ready(self):
+        from . import settings
+        from .languages import build_registry
+        from .utils import check_prefetch_policy
+
+        build_registry()
+
+        for name in ("PREFETCH_ON_MISS", "PREFETCH_LANGUAGES"):
+            check_prefetch_policy(
+                getattr(settings, name), "%s_%s" % (settings.APP_NAMESPACE, name)
+            )
@@ -1,7 +1,16 @@
-from django.utils.functional import cached_property
+import collections
+import sys
+import threading
+import time
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
 
 from functools import lru_cache
 
+from . import settings
+
 
 def _get_translation_field_names():
     """
@@ -17,17 +26,89 @@ def _get_translation_field_names():
 
 get_translation_field_names = lru_cache()(_get_translation_field_names)
 
+_BASE_FIELDS = [
+    "identifier",
+    "object_id",
+    "language",
+    "field_name",
+    "field_value",
+    "updated_at",
+]
 
-class CachedTranslation(object):
-    def __init__(self, **kwargs):
-        self.fields = get_translation_field_names()
 
-        attrs = self.fields + ["instance", "translation"]
+class BaseCachedTranslation(object):
+    """
+    Translation cache entry interface.
+    """
+
+    __slots__ = ()
+
+    @property
+    def fields(self):
+        return get_translation_field_names()
+
+    @property
+    def attrs(self):
+        """
+        Returns Translation attributes to pass as kwargs for creating or updating objects.
+        """
+        return dict((k, getattr(self, k)) for k in self.fields)
+
+    @property
+    def lookup(self):
+        """
+        Returns lookup for get() and filter() methods.
+        """
+        lookup = self.attrs
+        for field_name in ["field_value", "updated_at"]:
+            lookup.pop(field_name)
+        return lookup
+
+    def __str__(self):
+        return "%s:%s:%s:%s" % (
+            self.identifier,
+            self.object_id,
+            self.field_name,
+            self.language,
+        )
+
+
+class CachedTranslation(BaseCachedTranslation):
+    """
+    Translation cache entry: a fixed layout (``__slots__``) record of
+    Translation fields and state.
+
+    Fields added by a custom translation model are stored in ``extra``.
+    """
 
-        for attr in attrs:
-            setattr(self, attr, None)
+    __slots__ = (
+        "identifier",
+        "object_id",
+        "language",
+        "field_name",
+        "field_value",
+        "updated_at",
+        "instance",
+        "translation",
+        "is_new",
+        "has_changed",
+        "deleted",
+        "extra",
+    )
 
-        self.__dict__.update(**kwargs)
+    def __init__(self, **kwargs):
+        self.identifier = None
+        self.object_id = None
+        self.language = None
+        self.field_name = None
+        self.field_value = None
+        self.updated_at = None
+        self.instance = None
+        self.translation = None
+        self.extra = None
+
+        for attr, value in kwargs.items():
+            self._set(attr, value)
 
         self.is_new = True
         self.has_changed = False
@@ -42,42 +123,1038 @@ class CachedTranslation(object):
             for attr in ("language", "field_name", "field_value"):
                 setattr(self, attr, getattr(self.translation, attr))
 
-    @cached_property
-    def attrs(self):
-        """
-        Returns Translation attributes to pass as kwargs for creating or updating objects.
-        """
-        return dict((k, getattr(self, k)) for k in self.fields)
+    def __getattr__(self, name):
+        # Only called for extra fields (and unset slots)
+        extra = object.__getattribute__(self, "extra") if name != "extra" else None
+        if extra is not None and name in extra:
+            return extra[name]
+        if name in get_translation_field_names():
+            return None
+        raise AttributeError(
+            "'%s' object has no attribute '%s'" % (self.__class__.__name__, name)
+        )
 
-    @cached_property
-    def lookup(self):
-        """
-        Returns lookup for get() and filter() methods.
-        """
-        lookup = dict((k, getattr(self, k)) for k in self.fields)
-        for field_name in ["field_value", "updated_at"]:
-            lookup.pop(field_name)
-        return lookup
+    def _set(self, attr, value):
+        try:
+            setattr(self, attr, value)
+        except AttributeError:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[attr] = value
 
     @classmethod
     def from_object(cls, obj):
         """
         Updates values from the given object.
         """
-        instance = cls(
-            **dict(
-                (field, getattr(obj, field)) for field in get_translation_field_names()
-            )
+        return cls.from_values(
+            [getattr(obj, field) for field in get_translation_field_names()]
         )
 
+    @classmethod
+    def from_values(cls, values):
+        """
+        Returns a saved cached translation from a row of values ordered
+        like ``get_translation_field_names()`` (``values_list()`` rows).
+        """
+        fields = get_translation_field_names()
+
+        instance = cls.__new__(cls)
+        instance.instance = None
+        instance.translation = None
+        instance.extra = None
         instance.is_new = False
+        instance.has_changed = False
+        instance.deleted = False
+
+        if fields == _BASE_FIELDS:
+            (
+                instance.identifier,
+                instance.object_id,
+                instance.language,
+                instance.field_name,
+                instance.field_value,
+                instance.updated_at,
+            ) = values
+        else:
+            for field, value in zip(fields, values):
+                instance._set(field, value)
 
         return instance
 
-    def __str__(self):
-        return "%s:%s:%s:%s" % (
-            self.identifier,
-            self.object_id,
-            self.field_name,
-            self.language,
+
+class _Missing(object):
+    """
+    Marker of translations not cached in a ``TranslationStore``
+    (pickled by reference).
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __reduce__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+class TranslationLayout(object):
+    """
+    Field and language ordinals of a Linguist model, computed once at class
+    creation: translations of an instance are stored in a flat list, at
+    ``field ordinal * number of languages + language ordinal``.
+    """
+
+    __slots__ = ("fields", "languages", "field_ordinals", "language_ordinals", "size")
+
+    def __init__(self, fields, languages):
+        self.fields = list(fields)
+        self.languages = list(languages)
+        self.field_ordinals = dict((f, i) for i, f in enumerate(self.fields))
+        self.language_ordinals = dict((l, i) for i, l in enumerate(self.languages))
+        self.size = len(self.fields) * len(self.languages)
+
+    def index(self, field_name, language):
+        """
+        Returns the index of the given field and language, ``None`` if one
+        of them is unknown.
+        """
+        field_ordinal = self.field_ordinals.get(field_name)
+        language_ordinal = self.language_ordinals.get(language)
+        if field_ordinal is None or language_ordinal is None:
+            return None
+        return field_ordinal * len(self.languages) + language_ordinal
+
+
+class StoredTranslation(BaseCachedTranslation):
+    """
+    View over a translation of a ``TranslationStore``.
+    """
+
+    __slots__ = ("store", "index")
+
+    updated_at = None
+    translation = None
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    @property
+    def instance(self):
+        return self.store.instance
+
+    @property
+    def identifier(self):
+        return self.store.instance.linguist_identifier
+
+    @property
+    def object_id(self):
+        return self.store.instance.pk
+
+    @object_id.setter
+    def object_id(self, value):
+        # Always the instance pk
+        pass
+
+    @property
+    def field_name(self):
+        return self.store.layout.fields[self.index // len(self.store.layout.languages)]
+
+    @property
+    def language(self):
+        return self.store.layout.languages[
+            self.index % len(self.store.layout.languages)
+        ]
+
+    @property
+    def field_value(self):
+        if self.store.values is None:
+            return None
+        value = self.store.values[self.index]
+        return None if value is MISSING else value
+
+    @field_value.setter
+    def field_value(self, value):
+        self.store.write(self.index, value)
+
+    @property
+    def is_new(self):
+        return not self.store.stored >> self.index & 1
+
+    @is_new.setter
+    def is_new(self, value):
+        self.store.stored = self.store.set_bit(self.store.stored, not value, self.index)
+
+    @property
+    def has_changed(self):
+        return bool(self.store.changed >> self.index & 1)
+
+    @has_changed.setter
+    def has_changed(self, value):
+        self.store.changed = self.store.set_bit(self.store.changed, value, self.index)
+
+    @property
+    def deleted(self):
+        return bool(self.store.deleted >> self.index & 1)
+
+    @deleted.setter
+    def deleted(self, value):
+        self.store.deleted = self.store.set_bit(self.store.deleted, value, self.index)
+
+
+class FieldTranslations(object):
+    """
+    Mapping view (``{language: translation}``) over the translations of a
+    field in a ``TranslationStore``.
+    """
+
+    __slots__ = ("store", "field_name")
+
+    def __init__(self, store, field_name):
+        self.store = store
+        self.field_name = field_name
+
+    def __getitem__(self, language):
+        translation = self.store.get(self.field_name, language)
+        if translation is None:
+            raise KeyError(language)
+        return translation
+
+    def __setitem__(self, language, translation):
+        self.store.set_translation(translation, self.field_name, language)
+
+    def __contains__(self, language):
+        if self.is_absent(language):
+            return False
+        return self.store.get_value(self.field_name, language) is not MISSING
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __bool__(self):
+        return bool(self.keys())
+
+    def get(self, language, default=None):
+        translation = self.store.get(self.field_name, language)
+        return default if translation is None else translation
+
+    def is_absent(self, language):
+        """
+        Returns ``True`` if the translation is known to be missing (not an
+        entry, but still returned by ``[]`` and ``get()`` to be written).
+        """
+        return self.store.is_absent(self.field_name, language)
+
+    def keys(self):
+        return [
+            language
+            for field_name, language in self.store.keys()
+            if field_name == self.field_name
+        ]
+
+    def values(self):
+        return [self[language] for language in self.keys()]
+
+    def items(self):
+        return [(language, self[language]) for language in self.keys()]
+
+
+class TranslationStore(object):
+    """
+    Translations cache of an instance: translated values in a flat list
+    indexed by the model ``TranslationLayout``, with "saved", "changed" and
+    "deleted" bitmasks. Translations are only materialized as objects
+    (``StoredTranslation`` views) on demand.
+
+    Translations known to be missing are only flagged in an "absent"
+    bitmask: the list of values is allocated on first write.
+
+    Fields or languages unknown to the layout are stored as
+    ``CachedTranslation`` objects in ``extra``.
+
+    Behaves like the ``{field_name: {language: translation}}`` dictionary
+    it replaces.
+    """
+
+    __slots__ = (
+        "instance",
+        "layout",
+        "values",
+        "absent",
+        "stored",
+        "changed",
+        "deleted",
+        "extra",
+    )
+
+    def __init__(self, instance, layout):
+        self.instance = instance
+        self.layout = layout
+        self.clear()
+
+    def clear(self):
+        self.values = None
+        self.absent = 0
+        self.stored = 0
+        self.changed = 0
+        self.deleted = 0
+        self.extra = None
+
+    @staticmethod
+    def set_bit(mask, value, index):
+        if value:
+            return mask | (1 << index)
+        return mask & ~(1 << index)
+
+    def get_value(self, field_name, language):
+        """
+        Returns the cached value of the given translation, ``None`` if known
+        to be missing, ``MISSING`` if not cached.
+        """
+        index = self.layout.index(field_name, language)
+
+        if index is None:
+            translation = (self.extra or {}).get((field_name, language))
+            return MISSING if translation is None else translation.field_value
+
+        if self.values is not None and self.values[index] is not MISSING:
+            return self.values[index]
+
+        if self.absent >> index & 1:
+            return None
+
+        return MISSING
+
+    def is_absent(self, field_name, language):
+        """
+        Returns ``True`` if the given translation is known to be missing.
+        """
+        index = self.layout.index(field_name, language)
+
+        if index is None:
+            return False
+
+        return bool(
+            (self.values is None or self.values[index] is MISSING)
+            and self.absent >> index & 1
+        )
+
+    def get(self, field_name, language):
+        """
+        Returns the cached translation, ``None`` if not cached.
+        """
+        index = self.layout.index(field_name, language)
+
+        if index is None:
+            return (self.extra or {}).get((field_name, language))
+
+        if (
+            self.values is None or self.values[index] is MISSING
+        ) and not self.absent >> index & 1:
+            return None
+
+        return StoredTranslation(self, index)
+
+    def set(
+        self,
+        field_name,
+        language,
+        field_value=None,
+        is_new=True,
+        has_changed=False,
+        deleted=False,
+    ):
+        """
+        Caches a translation, returns it.
+        """
+        index = self.layout.index(field_name, language)
+
+        if index is None:
+            translation = CachedTranslation(
+                instance=self.instance,
+                field_name=field_name,
+                language=language,
+                field_value=field_value,
+            )
+            translation.is_new = is_new
+            translation.has_changed = has_changed
+            translation.deleted = deleted
+            if self.extra is None:
+                self.extra = {}
+            self.extra[(field_name, language)] = translation
+            return translation
+
+        self.write(index, field_value)
+        self.stored = self.set_bit(self.stored, not is_new, index)
+        self.changed = self.set_bit(self.changed, has_changed, index)
+        self.deleted = self.set_bit(self.deleted, deleted, index)
+
+        return StoredTranslation(self, index)
+
+    def set_translation(self, translation, field_name=None, language=None):
+        """
+        Caches the given translation (``Translation`` instance or cache
+        entry), returns it.
+        """
+        return self.set(
+            field_name or translation.field_name,
+            language or translation.language,
+            translation.field_value,
+            is_new=getattr(translation, "is_new", False),
+            has_changed=getattr(translation, "has_changed", False),
+            deleted=getattr(translation, "deleted", False),
+        )
+
+    def write(self, index, field_value):
+        """
+        Writes the value at the given index of the layout.
+        """
+        if self.values is None:
+            self.values = [MISSING] * self.layout.size
+
+        self.values[index] = field_value
+        self.absent &= ~(1 << index)
+
+    def populate(self, fields, languages):
+        """
+        Flags translations of the given fields and languages not cached yet
+        as known to be missing.
+        """
+        for field_name in fields:
+            for language in languages:
+                index = self.layout.index(field_name, language)
+                if index is None:
+                    if self.get_value(field_name, language) is MISSING:
+                        self.set(field_name, language)
+                elif self.values is None or self.values[index] is MISSING:
+                    self.absent |= 1 << index
+
+    def keys(self):
+        """
+        Returns cached ``(field_name, language)`` tuples, translations known
+        to be missing excluded.
+        """
+        keys = []
+
+        if self.values is not None:
+            languages = self.layout.languages
+            count = len(languages)
+            keys.extend(
+                (self.layout.fields[index // count], languages[index % count])
+                for index, value in enumerate(self.values)
+                if value is not MISSING
+            )
+
+        if self.extra:
+            keys.extend(self.extra)
+
+        return keys
+
+    def translations(self):
+        """
+        Returns cached translations.
+        """
+        return [self.get(field_name, language) for field_name, language in self.keys()]
+
+    def __getitem__(self, field_name):
+        return FieldTranslations(self, field_name)
+
+    def __contains__(self, field_name):
+        return any(key[0] == field_name for key in self.keys())
+
+    def __iter__(self):
+        return iter(self.fields())
+
+    def __len__(self):
+        return len(self.fields())
+
+    def fields(self):
+        """
+        Returns fields with cached translations.
+        """
+        return list(collections.OrderedDict.fromkeys(key[0] for key in self.keys()))
+
+    def items(self):
+        return [(field_name, self[field_name]) for field_name in self.fields()]
+
+    def get_languages(self):
+        """
+        Returns languages with cached translations.
+        """
+        return list(collections.OrderedDict.fromkeys(key[1] for key in self.keys()))
+
+
+def group_translations_rows(rows, objects, languages):
+    """
+    Groups translations rows (``values_list()`` rows) of the given objects
+    (``(identifier, object_id)`` tuples) by object and language:
+    ``{(identifier, object_id): {language: [row, ...]}}``. Objects without
+    translation in a language get an empty list.
+    """
+    fields = get_translation_field_names()
+    identifier_index = fields.index("identifier")
+    object_id_index = fields.index("object_id")
+    language_index = fields.index("language")
+
+    grouped = dict(
+        (obj, dict((language, []) for language in languages)) for obj in objects
+    )
+
+    for row in rows:
+        languages_rows = grouped.get((row[identifier_index], row[object_id_index]))
+        if languages_rows is not None and row[language_index] in languages_rows:
+            languages_rows[row[language_index]].append(tuple(row))
+
+    return grouped
+
+
+def get_rows_size(languages_rows):
+    """
+    Returns the approximate size in bytes of translations rows grouped by
+    language.
+    """
+    size = sys.getsizeof(languages_rows)
+    for rows in languages_rows.values():
+        size += sys.getsizeof(rows)
+        for row in rows:
+            size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class LocalCache(object):
+    """
+    Thread-safe process-local LRU cache of translations rows, grouped by
+    language, per ``(decider, identifier, object_id)``.
+
+    Bounded by ``max_entries`` and ``max_bytes`` (approximate), entries
+    expire after ``timeout`` seconds if set.
+
+    ``generation`` is bumped by invalidations: fills of rows read before
+    (see ``set_many()``) are dropped.
+    """
+
+    def __init__(self, max_entries, max_bytes=None, timeout=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """
+        Returns cache counters.
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def get_many(self, decider, objects, languages):
+        """
+        Returns ``{(identifier, object_id): {language: rows}}`` for the given
+        objects cached in all ``languages``.
+        """
+        label = decider._meta.label_lower
+        now = time.monotonic()
+        found = {}
+
+        with self.lock:
+            for obj in objects:
+                key = (label,) + tuple(obj)
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] is not None and entry[0] <= now:
+                    self._delete(key)
+                    entry = None
+                if entry is None or not all(lang in entry[1] for lang in languages):
+                    self.misses += 1
+                    continue
+                self.entries.move_to_end(key)
+                self.hits += 1
+                found[obj] = entry[1]
+
+        return found
+
+    def set_many(self, decider, grouped, generation=None):
+        """
+        Stores ``{(identifier, object_id): {language: rows}}``, merged with
+        languages already cached for the objects.
+
+        Rows are dropped if the cache was invalidated since ``generation``
+        (read before the rows).
+        """
+        label = decider._meta.label_lower
+        expires = None if self.timeout is None else time.monotonic() + self.timeout
+
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            for obj, languages_rows in grouped.items():
+                key = (label,) + tuple(obj)
+                entry = self.entries.get(key)
+                if entry is not None:
+                    languages_rows = dict(entry[1], **languages_rows)
+                    self._delete(key)
+                size = get_rows_size(languages_rows)
+                if self.max_bytes is not None and size > self.max_bytes:
+                    continue
+                self.entries[key] = (expires, languages_rows, size)
+                self.size += size
+                self._evict()
+
+    def delete_many(self, decider, identifier, object_ids):
+        """
+        Removes the given objects from the cache.
+        """
+        label = decider._meta.label_lower
+
+        with self.lock:
+            self.generation += 1
+            for object_id in object_ids:
+                self._delete((label, identifier, object_id))
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.size = 0
+
+    def _delete(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def _evict(self):
+        while self.entries and (
+            len(self.entries) > self.max_entries
+            or (self.max_bytes is not None and self.size > self.max_bytes)
+        ):
+            key, entry = self.entries.popitem(last=False)
+            self.size -= entry[2]
+            self.evictions += 1
+
+
+_local_cache = None
+_local_cache_lock = threading.Lock()
+
+
+def get_local_cache():
+    """
+    Returns the process-local translations cache configured by
+    ``settings.LOCAL_CACHE_MAX_ENTRIES``, ``settings.LOCAL_CACHE_MAX_BYTES``
+    and ``settings.LOCAL_CACHE_TIMEOUT``, ``None`` if disabled.
+    """
+    global _local_cache
+
+    if not settings.LOCAL_CACHE_MAX_ENTRIES:
+        return None
+
+    config = (
+        settings.LOCAL_CACHE_MAX_ENTRIES,
+        settings.LOCAL_CACHE_MAX_BYTES,
+        settings.LOCAL_CACHE_TIMEOUT,
+    )
+
+    with _local_cache_lock:
+        if (
+            _local_cache is None
+            or (
+                _local_cache.max_entries,
+                _local_cache.max_bytes,
+                _local_cache.timeout,
+            )
+            != config
+        ):
+            _local_cache = LocalCache(*config)
+        return _local_cache
+
+
+def get_shared_cache():
+    """
+    Returns the Django cache backend shared by processes to store
+    translations (``settings.CACHE_BACKEND`` alias), ``None`` if disabled.
+    """
+    if settings.CACHE_BACKEND is None:
+        return None
+    return caches[settings.CACHE_BACKEND]
+
+
+def get_version_key(decider, identifier, object_id):
+    """
+    Returns the cache key of the translations version of an object.
+    """
+    return "%s:%s:%s:%s" % (
+        settings.CACHE_PREFIX,
+        decider._meta.label_lower,
+        identifier,
+        object_id,
+    )
+
+
+def get_cache_key(decider, identifier, object_id, language, version):
+    """
+    Returns the cache key of the translations of an object in a language.
+    """
+    return "%s:%s:%s" % (
+        get_version_key(decider, identifier, object_id),
+        language,
+        version,
+    )
+
+
+def get_versions(cache, decider, objects, create=False):
+    """
+    Returns the shared cache translations versions of the given objects.
+
+    With ``create``, missing versions are created (with ``add()``, so
+    concurrent callers agree on a single version).
+    """
+    version_keys = dict(
+        (obj, get_version_key(decider, obj[0], obj[1])) for obj in objects
+    )
+    versions = cache.get_many(list(version_keys.values()))
+
+    if create:
+        missing = [key for key in version_keys.values() if key not in versions]
+        for version_key in missing:
+            cache.add(version_key, uuid.uuid4().hex, timeout=settings.CACHE_TIMEOUT)
+        if missing:
+            # add() loses to concurrent callers: read their versions back
+            versions.update(cache.get_many(missing))
+
+    return dict(
+        (obj, versions[version_key])
+        for obj, version_key in version_keys.items()
+        if version_key in versions
+    )
+
+
+def get_shared_versions(decider, objects):
+    """
+    Returns ``{(identifier, object_id): version}``, the shared cache
+    versions to store translations of the given objects with, ``None`` if
+    the shared cache is disabled.
+
+    Read before fetching translations: if they are invalidated meanwhile,
+    fetched rows are stored under the stale version and never read.
+    """
+    cache = get_shared_cache()
+
+    if cache is None:
+        return None
+
+    return get_versions(cache, decider, objects, create=True)
+
+
+def get_shared_translations(decider, objects, languages):
+    """
+    Reads translations of the given objects (``(identifier, object_id)``
+    tuples) from the shared cache.
+
+    Returns ``{(identifier, object_id): {language: rows}}`` for objects
+    cached in all ``languages``.
+    """
+    cache = get_shared_cache()
+
+    if cache is None or not objects:
+        return {}
+
+    keys = {}
+    for obj, version in get_versions(cache, decider, objects).items():
+        for language in languages:
+            key = get_cache_key(decider, obj[0], obj[1], language, version)
+            keys[key] = (obj, language)
+
+    cached = cache.get_many(list(keys))
+
+    found = {}
+    for key, (obj, language) in keys.items():
+        found.setdefault(obj, {})[language] = cached.get(key)
+
+    return dict(
+        (obj, languages_rows)
+        for obj, languages_rows in found.items()
+        if None not in languages_rows.values()
+    )
+
+
+def set_shared_translations(decider, grouped, versions):
+    """
+    Stores ``{(identifier, object_id): {language: rows}}`` in the shared
+    cache, under the given versions (see ``get_shared_versions()``).
+    """
+    cache = get_shared_cache()
+
+    if cache is None or not grouped or not versions:
+        return
+
+    cache.set_many(
+        dict(
+            (get_cache_key(decider, obj[0], obj[1], language, versions[obj]), rows)
+            for obj, languages_rows in grouped.items()
+            if obj in versions
+            for language, rows in languages_rows.items()
+        ),
+        timeout=settings.CACHE_TIMEOUT,
+    )
+
+
+def has_translations_cache():
+    """
+    Returns True if the local or the shared translations cache is enabled.
+    """
+    return bool(settings.LOCAL_CACHE_MAX_ENTRIES) or settings.CACHE_BACKEND is not None
+
+
+def get_cached_translations(decider, objects, languages):
+    """
+    Reads translations of the given objects (``(identifier, object_id)``
+    tuples) from the local cache, then from the shared cache.
+
+    Returns ``{(identifier, object_id): {language: rows}}`` for objects
+    cached in all ``languages``.
+    """
+    local_cache = get_local_cache()
+
+    found = {}
+    generation = None
+
+    if local_cache is not None:
+        generation = local_cache.generation
+        found.update(local_cache.get_many(decider, objects, languages))
+
+    shared = get_shared_translations(
+        decider, [obj for obj in objects if obj not in found], languages
+    )
+
+    if local_cache is not None and shared:
+        local_cache.set_many(decider, shared, generation)
+
+    found.update(shared)
+
+    return found
+
+
+def get_local_generation():
+    """
+    Returns the local cache generation (see ``LocalCache``), ``None`` if
+    disabled.
+    """
+    local_cache = get_local_cache()
+
+    if local_cache is None:
+        return None
+
+    return local_cache.generation
+
+
+def set_cached_translations(decider, grouped, versions=None, generation=None):
+    """
+    Stores ``{(identifier, object_id): {language: rows}}`` in the local and
+    shared caches (under ``generation`` and ``versions``, read before rows
+    were fetched).
+    """
+    local_cache = get_local_cache()
+
+    if local_cache is not None:
+        local_cache.set_many(decider, grouped, generation)
+
+    set_shared_translations(decider, grouped, versions)
+
+
+class SingleFlight(object):
+    """
+    Registry of in-flight cache refills: the first caller refilling a key
+    is the leader, other callers wait for it to be done.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def acquire(self, keys):
+        """
+        Returns keys claimed by the caller and events of the keys being
+        refilled by other callers.
+        """
+        claimed = []
+        events = {}
+
+        with self.lock:
+            for key in keys:
+                event = self.flights.get(key)
+                if event is None:
+                    self.flights[key] = threading.Event()
+                    claimed.append(key)
+                else:
+                    events[key] = event
+
+        return claimed, events
+
+    def release(self, keys):
+        with self.lock:
+            for key in keys:
+                event = self.flights.pop(key, None)
+                if event is not None:
+                    event.set()
+
+
+flights = SingleFlight()
+
+
+def get_lock_key(decider, identifier, object_id):
+    """
+    Returns the shared cache key locking the refill of an object.
+    """
+    return "%s:lock" % get_version_key(decider, identifier, object_id)
+
+
+def wait_translations(decider, objects, languages, events=None):
+    """
+    Waits (up to ``settings.CACHE_REFILL_TIMEOUT`` seconds) for the given
+    objects being refilled by other callers, then returns the ones cached
+    as ``{(identifier, object_id): {language: rows}}``.
+
+    With ``events``, objects are refilled in-process: they are read once
+    the refills are done (rows of other languages, or rows the caches
+    dropped, are not waited for). Otherwise objects are refilled by other
+    processes and polled in the shared cache.
+    """
+    deadline = time.monotonic() + settings.CACHE_REFILL_TIMEOUT
+
+    if events is not None:
+        for event in events:
+            event.wait(max(deadline - time.monotonic(), 0))
+        return get_cached_translations(decider, objects, languages)
+
+    found = get_cached_translations(decider, objects, languages)
+
+    while len(found) < len(objects) and time.monotonic() < deadline:
+        time.sleep(settings.CACHE_REFILL_INTERVAL)
+        found.update(
+            get_cached_translations(
+                decider, [obj for obj in objects if obj not in found], languages
+            )
         )
+
+    return found
+
+
+def refill_translations(decider, objects, languages, fetch):
+    """
+    Refills caches with translations of the given objects (``(identifier,
+    object_id)`` tuples) with ``fetch`` (objects to rows callable), once
+    for concurrent callers.
+
+    Objects already being refilled by another thread are waited for, and
+    fetched if they are still missing once that refill is done. With the
+    shared cache, single object refills (cache misses of an instance) are
+    also locked between processes: other processes poll the cache until
+    ``settings.CACHE_REFILL_TIMEOUT``.
+
+    Returns a tuple: objects refilled by others as ``{(identifier,
+    object_id): {language: rows}}`` and rows fetched by the caller.
+    """
+    label = decider._meta.label_lower
+
+    claimed, events = flights.acquire([(label,) + tuple(obj) for obj in objects])
+
+    cache = get_shared_cache()
+    locks = []
+
+    try:
+        leader = [key[1:] for key in claimed]
+        waiting = [obj for obj in objects if (label,) + tuple(obj) in events]
+        locked = []
+
+        if cache is not None and len(leader) == 1:
+            lock_key = get_lock_key(decider, leader[0][0], leader[0][1])
+            if cache.add(lock_key, 1, timeout=settings.CACHE_REFILL_TIMEOUT):
+                locks.append(lock_key)
+            else:
+                locked, leader = leader, []
+
+        found = {}
+
+        if waiting:
+            found.update(
+                wait_translations(decider, waiting, languages, events.values())
+            )
+
+        if locked:
+            found.update(wait_translations(decider, locked, languages))
+
+        leader.extend(obj for obj in waiting + locked if obj not in found)
+
+        generation = get_local_generation()
+        versions = get_shared_versions(decider, leader) if leader else None
+        rows = list(fetch(leader)) if leader else []
+
+        set_cached_translations(
+            decider,
+            group_translations_rows(rows, leader, languages),
+            versions,
+            generation,
+        )
+
+        return found, rows
+    finally:
+        if locks:
+            cache.delete_many(locks)
+        flights.release(claimed)
+
+
+def invalidate_translations(decider, identifier, object_ids):
+    """
+    Invalidates cached translations of the given objects: removes them from
+    the local cache and bumps their version in the shared cache.
+    """
+    local_cache = get_local_cache()
+
+    if local_cache is not None:
+        local_cache.delete_many(decider, identifier, object_ids)
+
+    cache = get_shared_cache()
+
+    if cache is None:
+        return
+
+    cache.set_many(
+        dict(
+            (get_version_key(decider, identifier, object_id), uuid.uuid4().hex)
+            for object_id in object_ids
+        ),
+        timeout=settings.CACHE_TIMEOUT,
+    )
+
+
+def invalidate_translations_on_commit(decider, identifier, object_ids, using=None):
+    """
+    Invalidates cached translations of the given objects now and once the
+    current transaction (of ``using`` database) is committed.
+
+    Other connections read committed rows only: caches they refill until
+    then are stale, and dropped by the second invalidation.
+    """
+    invalidate_translations(decider, identifier, object_ids)
+
+    transaction.on_commit(
+        lambda: invalidate_translations(decider, identifier, object_ids),
+        using=using,
+    )
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import contextvars
+
+from contextlib import ContextDecorator
+
+# Language overriding instances languages in the current context
+_language = contextvars.ContextVar("linguist_language", default=None)
+
+
+def get_override_language():
+    """
+    Returns the language set by ``override()`` in the current context
+    (thread or asyncio task), ``None`` if none.
+    """
+    return _language.get()
+
+
+class override(ContextDecorator):
+    """
+    Context manager / decorator overriding the active language of every
+    Linguist instance in the current context (thread or asyncio task),
+    without touching instances:
+
+    .. code-block:: python
+
+        with linguist.override("fr"):
+            post.title  # French title
+
+        @linguist.override("fr")
+        def view(request):
+            ...
+
+    Django language codes are resolved to supported languages
+    (``"fr-fr"`` is ``"fr"``, the default language if unsupported).
+    ``override(None)`` restores instances languages.
+    """
+
+    def __init__(self, language):
+        self.language = language
+        self.tokens = []
+
+    def _recreate_cm(self):
+        # Decorated functions can be called concurrently
+        return self.__class__(self.language)
+
+    def __enter__(self):
+        # Not imported at module level: linguist settings would be read when
+        # importing the package
+        from .languages import get_registry
+
+        language = self.language
+        if language is not None:
+            language = get_registry().resolve(language)
+        self.tokens.append(_language.set(language))
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _language.reset(self.tokens.pop())
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.expressions import Combinable, OrderBy
+from django.db.models.functions import Coalesce, NullIf
+
+from . import utils
+
+
+class Translated(Combinable):
+    """
+    Query expression selecting the translated value of a linguist field.
+
+    Can be used in ``annotate()``, ``values()``, ``values_list()``,
+    ``order_by()`` and as a filter value:
+
+    .. code-block:: python
+
+        Post.objects.annotate(title_fr=Translated("title", language="fr"))
+        Post.objects.values_list("pk", Translated("title", fallback=True))
+
+    Takes two optional arguments:
+
+    * ``language``: the language to select (defaults to the field name suffix,
+      then to the active language)
+    * ``fallback``: if the value is empty, returns the value in the default
+      language of the row (defaults to ``False``)
+    """
+
+    def __init__(self, field_name, language=None, fallback=False):
+        self.field_name = field_name
+        self.language = language
+        self.fallback = fallback
+
+    def __repr__(self):
+        return "%s(%r, language=%r, fallback=%r)" % (
+            self.__class__.__name__,
+            self.field_name,
+            self.language,
+            self.fallback,
+        )
+
+    def __eq__(self, other):
+        return (
+            self.__class__ == other.__class__
+            and self.field_name == other.field_name
+            and self.language == other.language
+            and self.fallback == other.fallback
+        )
+
+    def __hash__(self):
+        return hash((self.__class__, self.field_name, self.language, self.fallback))
+
+    def resolve_expression(
+        self, query=None, allow_joins=True, reuse=None, summarize=False, for_save=False
+    ):
+        return self.get_expression(query.model).resolve_expression(
+            query, allow_joins, reuse, summarize, for_save
+        )
+
+    def asc(self, **kwargs):
+        return OrderBy(self, **kwargs)
+
+    def desc(self, **kwargs):
+        return OrderBy(self, descending=True, **kwargs)
+
+    def get_expression(self, model):
+        """
+        Returns the SQL expression selecting the translated value for
+        the rows of the given model.
+        """
+        linguist = getattr(model, "_linguist", None)
+
+        if linguist is None:
+            raise FieldError(
+                "Cannot resolve translated field %s: %s is not a Linguist model"
+                % (self.field_name, model.__name__)
+            )
+
+        field_name, language = self.field_name, self.language
+
+        if field_name not in linguist.fields:
+            lookup = utils.get_translation_lookup(linguist.identifier, field_name, None)
+            if lookup["field_name"] not in linguist.fields:
+                raise FieldError(
+                    "Cannot resolve translated field %s on %s"
+                    % (field_name, model.__name__)
+                )
+            field_name = lookup["field_name"]
+            language = language or lookup["language"]
+
+        if language is None:
+            language = utils.get_language()
+
+        expression = get_translation_value(model, field_name, language)
+
+        if not self.fallback:
+            return expression
+
+        return Coalesce(
+            NullIf(expression, Value("", output_field=TextField())),
+            get_translation_value(model, field_name, get_default_language_ref(model)),
+        )
+
+
+def get_translation_value(model, field_name, language):
+    """
+    Returns a subquery selecting the translated value of ``field_name``
+    in ``language`` for the outer row.
+    """
+    linguist = model._linguist
+
+    return Subquery(
+        linguist.decider.objects.filter(
+            identifier=linguist.identifier,
+            object_id=OuterRef("pk"),
+            field_name=field_name,
+            language=language,
+        ).values("field_value")[:1]
+    )
+
+
+def get_default_language_ref(model):
+    """
+    Returns the default language of the outer row: a reference to the
+    ``default_language_field`` when it is a model field, the model
+    default language otherwise.
+    """
+    linguist = model._linguist
+
+    if linguist.default_language_field is not None:
+        try:
+            field = model._meta.get_field(linguist.default_language_field)
+        except FieldDoesNotExist:
+            field = None
+        if field is not None and field.concrete:
+            return OuterRef(linguist.default_language_field)
+
+    return linguist.default_language
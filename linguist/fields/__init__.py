@@ -1,12 +1,18 @@
-from collections import defaultdict
-
 from django.db import models
 from django.core.exceptions import ImproperlyConfigured
 from django.utils.functional import cached_property
 
 from .. import settings
 from .. import utils
-from ..cache import CachedTranslation
+from ..cache import (
+    MISSING,
+    CachedTranslation,
+    TranslationLayout,
+    TranslationStore,
+    has_translations_cache,
+)
+from ..context import get_override_language
+from ..languages import compile_fallback_languages, get_registry
 from ..models import Translation
 
 
@@ -18,6 +24,7 @@ class Linguist(object):
         self.default_language_field = kwargs.get("default_language_field", None)
         self.fields = kwargs.get("fields", None)
         self.decider = kwargs.get("decider", Translation)
+        self.fallback_languages = kwargs.get("fallback_languages", None) or {}
 
         self.validate_args()
 
@@ -25,6 +32,10 @@ class Linguist(object):
 
         self._language = None
 
+        # Languages of which all translations have been loaded: a cache miss
+        # in one of them means there is no translation.
+        self.loaded_languages = set()
+
     def validate_args(self):
         """
         Validates arguments.
@@ -48,13 +59,18 @@ class Linguist(object):
         """
         Returns active language.
         """
+        # Context language (if user uses linguist.override())
+        language = get_override_language()
+        if language is not None:
+            return language
+
         # Current instance language (if user uses activate_language() method)
         if self._language is not None:
             return self._language
 
         # Current site language (translation.get_language())
         current = utils.get_language()
-        if current in self.supported_languages:
+        if current in get_registry().supported_set:
             return current
 
         # Default language descriptor
@@ -68,18 +84,30 @@ class Linguist(object):
     def language(self, value):
         self._language = value
 
+    def get_fallback_languages(self, language=None):
+        """
+        Returns the fallback chain of the given language (defaults to active
+        language): the language, its fallback languages, then the default
+        language.
+        """
+        if language is None:
+            language = self.active_language
+
+        default_language = self.instance.default_language
+        chain = self.fallback_languages.get(language, (language,))
+
+        if default_language in chain:
+            return chain
+
+        return chain + (default_language,)
+
     @cached_property
     def supported_languages(self):
         return utils.get_supported_languages()
 
     @property
     def cached_languages(self):
-        langs = []
-        for k, v in self.instance._linguist_translations.items():
-            for lang in v.keys():
-                if lang not in langs:
-                    langs.append(lang)
-        return langs
+        return self.instance._linguist_translations.get_languages()
 
     @property
     def suffixed_fields(self):
@@ -87,7 +115,7 @@ class Linguist(object):
 
     @property
     def cached_fields(self):
-        return [k for k, v in self.instance._linguist_translations.items() if v]
+        return self.instance._linguist_translations.fields()
 
     @property
     def cached_suffixed_fields(self):
@@ -108,7 +136,8 @@ class Linguist(object):
     @property
     def translations(self):
         """
-        Returns translations dictionary.
+        Returns translations store (``{field: {language: translation}}``
+        like mapping).
         """
         return self.instance._linguist_translations
 
@@ -117,18 +146,165 @@ class Linguist(object):
         """
         Returns translation instances.
         """
-        return [
-            instance
-            for k, v in self.instance._linguist_translations.items()
-            for instance in v.values()
-        ]
+        return self.instance._linguist_translations.translations()
 
     @property
     def translations_count(self):
         """
         Returns translations count.
         """
-        return len(self.translation_instances)
+        return len(self.instance._linguist_translations.keys())
+
+    def hydrate_cache(
+        self, translations, populate_missing=True, languages=None, field_names=None
+    ):
+        """
+        Fills the cache with the given prefetched translations in one pass,
+        then (if ``populate_missing``) flags the gaps as known to be missing
+        in a second one.
+
+        Gaps are only filled for the prefetched ``languages`` (defaults to all
+        supported languages) and ``field_names`` (defaults to all fields):
+        others can still be loaded on demand.
+        """
+        store = self.instance._linguist_translations
+
+        for translation in translations:
+            store.set_translation(translation)
+
+        if populate_missing:
+            self.populate_missing_cache(languages=languages, field_names=field_names)
+
+    def populate_missing_cache(self, languages=None, field_names=None):
+        """
+        Flags translations of fields (defaults to all fields) and languages
+        (defaults to supported languages) not cached yet as known to be
+        missing.
+
+        Languages are only marked as loaded if all fields are.
+        """
+        registry = get_registry()
+
+        if languages is None:
+            languages = registry.codes
+        else:
+            languages = [registry.denormalize(language) for language in languages]
+
+        fields = self.fields
+
+        if field_names is not None:
+            fields = [field for field in self.fields if field in field_names]
+
+        if len(fields) == len(self.fields):
+            self.loaded_languages.update(languages)
+
+        self.instance._linguist_translations.populate(fields, languages)
+
+    def prefetch_siblings(self):
+        """
+        Prefetches translations for the instance and its siblings (instances
+        loaded by the same queryset evaluation) in a single query.
+
+        Returns True if the instance translations have been prefetched.
+        """
+        from ..helpers import prefetch_translations
+
+        siblings = getattr(self.instance, "_linguist_siblings", None)
+        self.instance._linguist_siblings = None
+
+        if not siblings:
+            return False
+
+        instances = [ref() for ref in siblings.values()]
+        instances = [instance for instance in instances if instance is not None]
+        siblings.clear()
+
+        for instance in instances:
+            instance._linguist_siblings = None
+
+        if not any(instance is self.instance for instance in instances):
+            instances.append(self.instance)
+
+        prefetch_translations(instances)
+
+        return True
+
+    def prefetch_instance(self, language):
+        """
+        Loads every translation of the instance in a single query, as
+        defined by ``settings.PREFETCH_ON_MISS`` policy (``"all"`` or
+        ``"active+fallback"``), including the given ``language``.
+
+        Without policy, if the local or shared cache is enabled, translations
+        in the given ``language`` are loaded as they are cached by language.
+
+        Returns True if translations in the given ``language`` have been
+        loaded.
+        """
+        if settings.PREFETCH_ON_MISS:
+            languages = utils.get_prefetch_languages(
+                settings.PREFETCH_ON_MISS, self.instance
+            )
+        elif has_translations_cache():
+            languages = [language]
+        else:
+            return False
+
+        # Language codes as defined in settings, as used by descriptors
+        if languages is None:
+            languages = list(get_registry().codes)
+
+        if language not in languages:
+            languages.append(language)
+
+        self.prefetch_languages(languages)
+
+        return language in self.loaded_languages
+
+    def prefetch_languages(self, languages):
+        """
+        Loads every translation of the instance in the given languages (not
+        loaded yet) in a single query.
+        """
+        languages = [lang for lang in languages if lang not in self.loaded_languages]
+
+        if not languages:
+            return
+
+        translations = utils.get_decider_translations(
+            self.decider, {self.identifier: [self.instance.pk]}, languages=languages
+        )
+
+        self.hydrate_cache(
+            [CachedTranslation.from_values(values) for values in translations],
+            populate_missing=False,
+        )
+        self.loaded_languages.update(languages)
+
+    def prefetch_fallback_languages(self, field_name, languages):
+        """
+        Makes sure resolving the given fallback chain of ``field_name`` costs
+        at most a single query: languages of the chain not cached, up to the
+        first cached value, are loaded together.
+        """
+        if self.instance.pk is None:
+            return
+
+        get_value = self.instance._linguist_translations.get_value
+        missing = []
+
+        for language in languages:
+            value = get_value(field_name, language)
+            if value is MISSING:
+                if language not in self.loaded_languages:
+                    missing.append(language)
+            elif value:
+                # Chain resolved here: later languages are never read
+                break
+
+        # A single miss is loaded on access, as defined by prefetch policies
+        if len(missing) > 1 and not self.prefetch_siblings():
+            self.prefetch_languages(missing)
 
     def get_cache(
         self,
@@ -142,19 +318,33 @@ class Linguist(object):
         Returns translation from cache.
         """
         is_new = bool(instance.pk is None)
-
-        try:
-            cached_obj = instance._linguist_translations[field_name][language]
-            if not cached_obj.field_name:
-                cached_obj.field_name = field_name
-            if not cached_obj.language:
-                cached_obj.language = language
-            if not cached_obj.identifier:
-                cached_obj.identifier = self.instance.linguist_identifier
-        except KeyError:
-            cached_obj = None
-
-            if not is_new:
+        store = instance._linguist_translations
+
+        cached_obj = store.get(field_name, language)
+
+        if cached_obj is None:
+            if not is_new and translation is None and self.prefetch_siblings():
+                return self.get_cache(
+                    instance,
+                    language=language,
+                    field_name=field_name,
+                    field_value=field_value,
+                )
+
+            if (
+                not is_new
+                and translation is None
+                and language not in self.loaded_languages
+                and self.prefetch_instance(language)
+            ):
+                return self.get_cache(
+                    instance,
+                    language=language,
+                    field_name=field_name,
+                    field_value=field_value,
+                )
+
+            if not is_new and language not in self.loaded_languages:
                 if translation is None:
                     try:
                         translation = self.decider.objects.get(
@@ -166,23 +356,32 @@ class Linguist(object):
                     except self.decider.DoesNotExist:
                         pass
 
-            if cached_obj is None:
-                if translation is not None:
-                    cached_obj = CachedTranslation.from_object(translation)
-                else:
-                    cached_obj = CachedTranslation(
-                        instance=instance,
-                        language=language,
-                        field_name=field_name,
-                        field_value=field_value,
-                    )
-
-            instance._linguist_translations[cached_obj.field_name][
-                cached_obj.language
-            ] = cached_obj
+            if translation is not None:
+                cached_obj = store.set(
+                    translation.field_name,
+                    translation.language,
+                    translation.field_value,
+                    is_new=False,
+                )
+            else:
+                cached_obj = store.set(field_name, language, field_value)
 
         return cached_obj
 
+    def get_value(self, field_name, language):
+        """
+        Returns the cached value of a translation (fast path), loads it
+        with ``get_cache()`` if not cached.
+        """
+        value = self.instance._linguist_translations.get_value(field_name, language)
+
+        if value is MISSING:
+            value = self.get_cache(
+                self.instance, language=language, field_name=field_name
+            ).field_value
+
+        return value
+
     def set_cache(
         self,
         instance=None,
@@ -195,11 +394,7 @@ class Linguist(object):
         Add a new translation into the cache.
         """
         if instance is not None and translation is not None:
-            cached_obj = CachedTranslation.from_object(translation)
-            instance._linguist_translations[translation.field_name][
-                translation.language
-            ] = cached_obj
-            return cached_obj
+            return instance._linguist_translations.set_translation(translation)
 
         if instance is None:
             instance = self.instance
@@ -259,6 +454,14 @@ class CacheDescriptor(object):
         self.default_language = meta.get("default_language", settings.DEFAULT_LANGUAGE)
         self.default_language_field = meta.get("default_language_field", None)
         self.decider = meta.get("decider", Translation)
+        self.fallback_languages = compile_fallback_languages(
+            meta.get("fallback_languages", settings.FALLBACK_LANGUAGES),
+            default_language=(
+                self.default_language if self.default_language_field is None else None
+            ),
+        )
+        # Language codes as defined in settings, as used by descriptors
+        self.layout = TranslationLayout(self.fields or (), get_registry().codes)
 
     def __get__(self, instance, instance_type=None):
         if instance is None:
@@ -274,10 +477,15 @@ class CacheDescriptor(object):
                 default_language_field=self.default_language_field,
                 fields=self.fields,
                 decider=self.decider,
+                fallback_languages=self.fallback_languages,
             )
 
             setattr(instance, "_linguist_cache", linguist)
-            setattr(instance, "_linguist_translations", defaultdict(dict))
+            setattr(
+                instance,
+                "_linguist_translations",
+                TranslationStore(instance, self.layout),
+            )
 
         return instance._linguist_cache
 
@@ -302,12 +510,10 @@ class TranslationDescriptor(object):
         if not instance:
             return self
 
-        obj = instance._linguist.get_cache(
-            instance=instance,
-            language=self.language,
-            field_name=self.translated_field.name,
+        return (
+            instance._linguist.get_value(self.translated_field.name, self.language)
+            or ""
         )
-        return obj.field_value or ""
 
     def __set__(self, instance, value):
         if not instance:
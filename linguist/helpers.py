@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 import collections
+import weakref
 
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, prefetch_related_objects
+from django.db.models.constants import LOOKUP_SEP
+
+from . import settings
 from . import utils
 
 collections_abc = getattr(collections, 'abc', collections)
@@ -10,26 +16,176 @@ def prefetch_translations(instances, **kwargs):
     """
     Prefetches translations for the given instances.
     Can be useful for a list of instances.
+
+    Instances can be of different models: translations of all the models
+    sharing a decider are fetched in a single query.
     """
     from .mixins import ModelMixin
 
     if not isinstance(instances, collections_abc.Iterable):
         instances = [instances]
 
+    related = kwargs.pop("related", None)
     populate_missing = kwargs.get("populate_missing", True)
-    grouped_translations = utils.get_grouped_translations(instances, **kwargs)
 
-    # In the case of no translations objects
-    if not grouped_translations and populate_missing:
-        for instance in instances:
-            instance.populate_missing_translations()
+    models = list(
+        collections.OrderedDict.fromkeys(instance.__class__ for instance in instances)
+    )
+
+    if related:
+        for model in models:
+            prefetch_related_objects(
+                [instance for instance in instances if instance.__class__ is model],
+                *get_translation_prefetches(model, related, **kwargs)
+            )
+
+    if kwargs.get("languages") is None and settings.PREFETCH_LANGUAGES:
+        kwargs["languages"] = get_prefetch_languages(instances)
+
+    # Instances of different models: translations are grouped by identifier
+    mixed = len(models) > 1
+
+    if mixed:
+        grouped_translations = utils.get_mixed_grouped_translations(instances, **kwargs)
+    else:
+        grouped_translations = utils.get_grouped_translations(instances, **kwargs)
+
+    languages = kwargs.get("languages")
+    if languages is not None and not isinstance(languages, (list, tuple)):
+        languages = [languages]
+
+    field_names = kwargs.get("field_names")
+    if field_names is not None and not isinstance(field_names, (list, tuple)):
+        field_names = [field_names]
+
+    for instance in instances:
+        if issubclass(instance.__class__, ModelMixin):
+            key = (instance._linguist.identifier, instance.pk) if mixed else instance.pk
+            instance._linguist.hydrate_cache(
+                grouped_translations.get(key, ()),
+                populate_missing=populate_missing,
+                languages=languages,
+                field_names=field_names,
+            )
+
+
+def get_translation_prefetches(model, lookups, **kwargs):
+    """
+    Returns ``prefetch_related()`` lookups loading the given related lookups
+    of ``model`` with their translations: one ``Prefetch`` per relation
+    level, each one prefetching translations of the whole level in a
+    single query.
+
+    ``field_names`` is not forwarded, it only applies to ``model`` fields.
+    """
+    from .mixins import QuerySetMixin
+
+    kwargs.pop("field_names", None)
+
+    prefetches = []
+    seen = set()
+
+    for lookup in lookups:
+        current_model = model
+        path = []
+
+        for name in lookup.split(LOOKUP_SEP):
+            path.append(name)
+            current_model = get_related_model(current_model, name)
+            prefetch_to = LOOKUP_SEP.join(path)
+
+            if prefetch_to in seen:
+                continue
+
+            seen.add(prefetch_to)
+
+            queryset = current_model._default_manager.all()
+
+            if isinstance(queryset, QuerySetMixin):
+                prefetches.append(
+                    Prefetch(prefetch_to, queryset=queryset.with_translations(**kwargs))
+                )
+            else:
+                prefetches.append(prefetch_to)
+
+    return prefetches
+
+
+def get_prefetch_related_lookups(lookups, prefetches):
+    """
+    Merges translation ``prefetches`` into existing ``prefetch_related()``
+    lookups: plain lookups on the same path are replaced, ``Prefetch``
+    objects on the same path are kept as is. Lookups are ordered by depth
+    so that each level is prefetched before the levels below it.
+    """
+    paths = set(getattr(lookup, "prefetch_to", lookup) for lookup in prefetches)
+
+    lookups = [
+        lookup
+        for lookup in lookups
+        if not (isinstance(lookup, str) and lookup in paths)
+    ]
+
+    paths = set(getattr(lookup, "prefetch_to", lookup) for lookup in lookups)
+
+    lookups.extend(
+        prefetch
+        for prefetch in prefetches
+        if getattr(prefetch, "prefetch_to", prefetch) not in paths
+    )
+
+    return tuple(
+        sorted(
+            lookups,
+            key=lambda lookup: getattr(lookup, "prefetch_to", lookup).count(LOOKUP_SEP),
+        )
+    )
+
+
+def get_related_model(model, name):
+    """
+    Returns the model related to ``model`` through the ``name`` relation
+    (field name or reverse accessor name).
+    """
+    for field in model._meta.get_fields():
+        if not field.is_relation or field.related_model is None:
+            continue
+        accessor_name = getattr(field, "get_accessor_name", None)
+        if name == field.name or (accessor_name and name == accessor_name()):
+            return field.related_model
+
+    raise FieldDoesNotExist("%s has no relation named '%s'" % (model.__name__, name))
+
+
+def get_prefetch_languages(instances):
+    """
+    Returns languages to prefetch for the given instances according to
+    ``settings.PREFETCH_LANGUAGES`` policy (``None`` for all languages).
+    """
+    languages = []
+
+    for instance in instances:
+        instance_languages = utils.get_prefetch_languages(
+            settings.PREFETCH_LANGUAGES, instance
+        )
+        if instance_languages is None:
+            return None
+        for language in instance_languages:
+            if language not in languages:
+                languages.append(language)
+
+    return languages
+
+
+def set_translations_siblings(instances):
+    """
+    Links the given instances together: the first translation cache miss
+    on any of them prefetches translations for all of them.
+
+    Siblings are weak references keyed by ``id()``: equal instances (same
+    pk loaded twice) are distinct siblings.
+    """
+    siblings = dict((id(instance), weakref.ref(instance)) for instance in instances)
 
     for instance in instances:
-        if (
-            issubclass(instance.__class__, ModelMixin)
-            and instance.pk in grouped_translations
-        ):
-            for translation in grouped_translations[instance.pk]:
-                instance._linguist.set_cache(instance=instance, translation=translation)
-            if populate_missing:
-                instance.populate_missing_translations()
+        instance._linguist_siblings = siblings
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+from django.core.exceptions import ImproperlyConfigured
+
+from . import settings
+
+# Maximum number of memoized Django language codes
+RESOLVED_MAX_ENTRIES = 1024
+
+
+class LanguageRegistry(object):
+    """
+    Lookup tables of supported languages, built once from
+    ``settings.SUPPORTED_LANGUAGES`` and ``settings.DEFAULT_LANGUAGE``.
+
+    * ``codes``: language codes, as defined in settings (``"fr-ca"``)
+    * ``supported``: language codes used in field names (``"fr_ca"``)
+    * ``code_set`` / ``supported_set``: frozen sets of the above
+    * ``ordinals``: ``{supported code: position}``
+    * ``normalized``: ``{code: supported code}`` (``-`` to ``_``)
+    * ``denormalized``: ``{supported code: code}`` (``_`` to ``-``)
+    * ``names``: ``{code: language name}``
+    """
+
+    def __init__(self, languages, default_language):
+        self.source = languages
+        self.default_language = default_language
+
+        self.codes = tuple(code for code, name in languages)
+        self.supported = tuple(code.replace("-", "_") for code in self.codes)
+        self.code_set = frozenset(self.codes)
+        self.supported_set = frozenset(self.supported)
+        self.ordinals = dict(
+            (code, ordinal) for ordinal, code in enumerate(self.supported)
+        )
+        self.normalized = dict(zip(self.codes, self.supported))
+        self.normalized.update(zip(self.supported, self.supported))
+        self.denormalized = dict(zip(self.supported, self.codes))
+        self.names = dict(languages)
+
+        # Django language code => supported language code
+        self.resolved = {}
+
+    def is_stale(self):
+        """
+        Returns ``True`` if settings changed since the registry was built.
+        """
+        return (
+            self.source is not settings.SUPPORTED_LANGUAGES
+            or self.default_language != settings.DEFAULT_LANGUAGE
+        )
+
+    def normalize(self, code):
+        """
+        Returns the given language code as used in field names.
+        """
+        try:
+            return self.normalized[code]
+        except KeyError:
+            return code.replace("-", "_")
+
+    def denormalize(self, code):
+        """
+        Returns the given language code as defined in settings.
+        """
+        return self.denormalized.get(code, code)
+
+    def resolve(self, code):
+        """
+        Returns the supported language code matching the given Django
+        language code (``"fr-be"`` is ``"fr"`` if only ``"fr"`` is supported),
+        the default language if none.
+        """
+        try:
+            return self.resolved[code]
+        except KeyError:
+            pass
+
+        language = code
+        if language not in self.code_set and "-" in language:
+            language = language.split("-")[0]
+
+        if language not in self.code_set:
+            language = self.default_language
+
+        if len(self.resolved) < RESOLVED_MAX_ENTRIES:
+            self.resolved[code] = language
+
+        return language
+
+
+_registry = None
+
+
+def build_registry():
+    """
+    Builds the languages registry from settings.
+    """
+    global _registry
+    _registry = LanguageRegistry(
+        settings.SUPPORTED_LANGUAGES, settings.DEFAULT_LANGUAGE
+    )
+    return _registry
+
+
+def get_registry():
+    """
+    Returns the languages registry (built at app loading), rebuilt if
+    settings changed since.
+    """
+    registry = _registry
+    if registry is None or registry.is_stale():
+        registry = build_registry()
+    return registry
+
+
+def compile_fallback_languages(fallback_languages, default_language=None):
+    """
+    Compiles declarative fallback chains (``{language: [fallback, ...]}``)
+    into ``{language: (language, fallback, ..., default_language)}`` for
+    every supported language.
+
+    Chains are followed depth first: ``{"fr-ca": ["fr"], "fr": ["en"]}``
+    compiles ``"fr-ca"`` into ``("fr-ca", "fr", "en")``.
+    """
+    registry = get_registry()
+
+    fallbacks = {}
+    for language, languages in (fallback_languages or {}).items():
+        if isinstance(languages, str):
+            languages = [languages]
+        for code in [language] + list(languages):
+            if registry.denormalize(code) not in registry.code_set:
+                raise ImproperlyConfigured(
+                    'Fallback language "%s" is not a supported language' % code
+                )
+        fallbacks[registry.denormalize(language)] = [
+            registry.denormalize(code) for code in languages
+        ]
+
+    chains = {}
+
+    for code in registry.codes:
+        chain = []
+        pending = [code]
+
+        while pending:
+            language = pending.pop(0)
+            if language in chain:
+                continue
+            chain.append(language)
+            pending[0:0] = fallbacks.get(language, ())
+
+        if default_language is not None and default_language not in chain:
+            chain.append(default_language)
+
+        chains[code] = chains[registry.normalize(code)] = tuple(chain)
+
+    return chains
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+import itertools
+import queue
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_datetime
+
+from ... import settings
+from ... import utils
+from ...models import Translation
+
+
+def get_rows_bytes(rows):
+    """
+    Returns the approximate size in bytes of translations rows.
+    """
+    return sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in rows
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Warms up the shared translations cache: streams objects with "
+        "translations by batches and loads them in the cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--decider",
+            help="Translation model (app_label.ModelName), defaults to Translation",
+        )
+        parser.add_argument(
+            "--identifier",
+            action="append",
+            dest="identifiers",
+            help="Only warm up this identifier (can be repeated)",
+        )
+        parser.add_argument(
+            "--language",
+            action="append",
+            dest="languages",
+            help="Only warm up this language (can be repeated)",
+        )
+        parser.add_argument("--min-id", type=int, help="Minimum object ID")
+        parser.add_argument("--max-id", type=int, help="Maximum object ID")
+        parser.add_argument(
+            "--updated-after", help="Only translations updated after this datetime"
+        )
+        parser.add_argument(
+            "--updated-before", help="Only translations updated before this datetime"
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of objects per batch (defaults to 1000)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.PREFETCH_WORKERS or 1,
+            help="Number of batches loaded in parallel",
+        )
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            help="Approximate memory budget of batches loaded in parallel",
+        )
+
+    def handle(self, *args, **options):
+        # The local cache of this process is gone once the command exits
+        if settings.CACHE_BACKEND is None:
+            raise CommandError(
+                "No shared translations cache is enabled: set "
+                "LINGUIST_CACHE_BACKEND."
+            )
+
+        decider = Translation
+        if options["decider"]:
+            try:
+                decider = apps.get_model(options["decider"])
+            except (LookupError, ValueError) as e:
+                raise CommandError(e)
+
+        self.decider = decider
+        self.languages = options["languages"]
+        self.batch_size = options["batch_size"]
+
+        queryset = decider.objects.all()
+
+        lookup = utils.get_translations_lookup(languages=self.languages)
+        if options["identifiers"]:
+            lookup["identifier__in"] = options["identifiers"]
+        if options["min_id"] is not None:
+            lookup["object_id__gte"] = options["min_id"]
+        if options["max_id"] is not None:
+            lookup["object_id__lte"] = options["max_id"]
+        for option, lookup_name in (
+            ("updated_after", "updated_at__gte"),
+            ("updated_before", "updated_at__lte"),
+        ):
+            if options[option]:
+                value = parse_datetime(options[option])
+                if value is None:
+                    raise CommandError(
+                        "%s is not a valid datetime: %s"
+                        % (option.replace("_", "-"), options[option])
+                    )
+                lookup[lookup_name] = value
+
+        queryset = queryset.filter(**lookup)
+
+        started = time.monotonic()
+        objects_count, rows_count, total_bytes = self.warm(
+            queryset, options["workers"], options["max_bytes"]
+        )
+        elapsed = max(time.monotonic() - started, 1e-6)
+
+        self.stdout.write(
+            "Loaded %d translations of %d objects (%d bytes) in %.2fs: "
+            "%d rows/s"
+            % (
+                rows_count,
+                objects_count,
+                total_bytes,
+                elapsed,
+                rows_count / elapsed,
+            )
+        )
+
+    def get_batches(self, queryset):
+        """
+        Yields objects (``{identifier: [object_id, ...]}``) of translations
+        by batches of ``batch_size`` objects, streamed from a single query
+        over distinct ``(identifier, object_id)`` keys, in order.
+        """
+        keys = (
+            queryset.order_by("identifier", "object_id")
+            .values_list("identifier", "object_id")
+            .distinct()
+            .iterator(chunk_size=self.batch_size)
+        )
+
+        while True:
+            batch = list(itertools.islice(keys, self.batch_size))
+
+            if not batch:
+                return
+
+            identifiers = {}
+            for identifier, object_id in batch:
+                identifiers.setdefault(identifier, []).append(object_id)
+
+            yield identifiers
+
+    def load(self, identifiers):
+        """
+        Loads the given objects in caches, returns the number of objects,
+        the number of rows and their size in bytes.
+        """
+        rows = list(
+            utils.get_decider_translations(
+                self.decider, identifiers, languages=self.languages
+            )
+        )
+
+        objects_count = sum(len(ids) for ids in identifiers.values())
+
+        return objects_count, len(rows), get_rows_bytes(rows)
+
+    def warm(self, queryset, workers, max_bytes):
+        """
+        Loads batches, several in parallel with ``workers`` threads while
+        the last batches size allows to stay in ``max_bytes``.
+
+        Batches are read by the calling thread and loaded by worker
+        threads, each closing its connection once done.
+        """
+        totals = [0, 0, 0]
+
+        def add(result):
+            for i, value in enumerate(result):
+                totals[i] += value
+
+        if workers <= 1:
+            for identifiers in self.get_batches(queryset):
+                add(self.load(identifiers))
+            return totals
+
+        db = self.decider.objects.db
+        pending = queue.Queue()
+        condition = threading.Condition()
+        in_flight = 0
+        batch_bytes = 0
+        failed = False
+
+        def work():
+            nonlocal in_flight, batch_bytes, failed
+            try:
+                while True:
+                    identifiers = pending.get()
+                    if identifiers is None:
+                        return
+                    result = None
+                    try:
+                        result = self.load(identifiers)
+                    finally:
+                        with condition:
+                            in_flight -= 1
+                            if result is None:
+                                failed = True
+                            else:
+                                add(result)
+                                batch_bytes = max(batch_bytes, result[2])
+                            condition.notify()
+            finally:
+                connections[db].close()
+
+        def get_max_in_flight():
+            if max_bytes and batch_bytes:
+                return max(1, min(workers, max_bytes // batch_bytes))
+            return workers
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(work) for i in range(workers)]
+            try:
+                for identifiers in self.get_batches(queryset):
+                    with condition:
+                        while not failed and in_flight >= get_max_in_flight():
+                            condition.wait()
+                        if failed:
+                            break
+                        in_flight += 1
+                    pending.put(identifiers)
+            finally:
+                for future in futures:
+                    pending.put(None)
+
+            for future in futures:
+                future.result()
+
+        return totals
@@ -5,6 +5,7 @@ from django.forms.utils import pretty_name
 
 from . import settings
 from . import utils
+from .cache import MISSING
 from .fields import TranslationDescriptor, files
 
 
@@ -35,24 +36,53 @@ def validate_meta(meta):
             "Linguist Meta's fields attribute must be a list or tuple"
         )
 
+    if not isinstance(meta.get("fallback_languages", {}), dict):
+        raise ImproperlyConfigured(
+            "Linguist Meta's fallback_languages attribute must be a dict"
+        )
 
-def default_value_getter(field):
+
+def default_value_getter(field, descriptor_class=None):
     """
     When accessing to the name of the field itself, the value
     in the current language will be returned. Unless it's set,
-    the value in the default language will be returned.
+    the value in the first fallback language set (default language
+    at last) will be returned.
     """
+    # Cached values can be returned as is (not wrapped by the descriptor)
+    raw_values = descriptor_class in (None, TranslationDescriptor)
+
+    # language => localized field name
+    localized_fields = {}
+
+    def get_localized_field(language):
+        try:
+            return localized_fields[language]
+        except KeyError:
+            localized_field = utils.build_localized_field_name(field, language)
+            localized_fields[language] = localized_field
+            return localized_field
 
     def default_value_func_getter(self):
-        localized_field = utils.build_localized_field_name(
-            field, self._linguist.active_language
-        )
-        value = getattr(self, localized_field)
-        if value:
-            return value
+        linguist = self._linguist
+        language = linguist.active_language
+
+        # Fast path: value cached in the active language
+        value = self._linguist_translations.get_value(field, language)
+        if value and value is not MISSING:
+            if raw_values:
+                return value
+            return getattr(self, get_localized_field(language))
+
+        languages = linguist.get_fallback_languages(language)
+        linguist.prefetch_fallback_languages(field, languages)
+
+        for language in languages:
+            value = getattr(self, get_localized_field(language))
+            if value:
+                return value
 
-        default_field = utils.build_localized_field_name(field, self.default_language)
-        return getattr(self, default_field)
+        return value
 
     return default_value_func_getter
 
@@ -224,7 +254,13 @@ class ModelMeta(models.base.ModelBase):
                 new_class,
                 field_name,
                 property(
-                    default_value_getter(field_name), default_value_setter(field_name)
+                    default_value_getter(
+                        field_name,
+                        descriptor_class=get_translation_class_kwargs(
+                            field.__class__
+                        ).get("descriptor_class"),
+                    ),
+                    default_value_setter(field_name),
                 ),
             )
 
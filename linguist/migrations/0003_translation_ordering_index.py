@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("linguist", "0002_auto_20170126_0355")]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name="translation",
+            index_together=set(
+                [
+                    ("identifier", "object_id"),
+                    ("identifier", "object_id", "field_name"),
+                    ("identifier", "field_name", "language"),
+                ]
+            ),
+        )
+    ]
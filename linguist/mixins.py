@@ -1,34 +1,72 @@
 # -*- coding: utf-8 -*-
+import collections
 import copy
+import itertools
+import warnings
 
 from contextlib import contextmanager
 
 import django
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
 from django.db import models
+from django.db.models.query import ModelIterable as BaseModelIterable
 from django.utils.functional import cached_property
 
+from . import settings
 from . import utils
-from .cache import CachedTranslation
-from .helpers import prefetch_translations
+from .expressions import Translated
+from .helpers import (
+    get_prefetch_related_lookups,
+    get_translation_prefetches,
+    prefetch_translations,
+    set_translations_siblings,
+)
 
 
-if django.VERSION >= (1, 11):
-    from django.db.models.query import ModelIterable as BaseModelIterable
+class ModelIterable(BaseModelIterable):
+    """
+    Model iterable prefetching translations of the loaded instances
+    when ``with_translations()`` has been called on the queryset.
+
+    Otherwise, with ``settings.AUTO_PREFETCH``, loaded instances are linked
+    together so the first translation cache miss prefetches translations
+    for all of them.
+
+    With ``QuerySet.iterator()``, translations are fetched for each
+    chunk of ``chunk_size`` rows, and the chunk is released before the
+    next one is loaded.
+    """
 
-    class ModelIterable(BaseModelIterable):
-        model = None
+    def __iter__(self):
+        prefetch_kwargs = getattr(self.queryset, "_prefetch_translations", None)
 
-        def __iter__(self):
+        if prefetch_kwargs is None and not settings.AUTO_PREFETCH:
             for obj in super(ModelIterable, self).__iter__():
-                if obj and not isinstance(obj, self.queryset.model):
-                    yield obj
-                    continue
+                yield obj
+            return
 
-                utils.set_object_translations_cache(obj, self.queryset)
+        objs = super(ModelIterable, self).__iter__()
+        chunk_size = self.chunk_size if self.chunked_fetch else None
 
+        while True:
+            chunk = list(itertools.islice(objs, chunk_size))
+            if not chunk:
+                return
+
+            instances = [obj for obj in chunk if isinstance(obj, self.queryset.model)]
+
+            if prefetch_kwargs is not None:
+                prefetch_translations(instances, **prefetch_kwargs)
+            else:
+                set_translations_siblings(instances)
+
+            del instances
+
+            for obj in chunk:
                 yield obj
 
+            del chunk
+
 
 class QuerySetMixin(object):
     """
@@ -36,55 +74,36 @@ class QuerySetMixin(object):
     """
 
     def __init__(self, *args, **kwargs):
-        self.init(*args, **kwargs)
-
         super(QuerySetMixin, self).__init__(*args, **kwargs)
 
-        if django.VERSION >= (1, 11):
-            self._iterable_class = ModelIterable
+        self._iterable_class = ModelIterable
+        self._prefetch_translations = None
 
     def init(self, *args, **kwargs):
-        self._prefetched_translations_cache = kwargs.pop(
-            "_prefetched_translations_cache", []
-        )
-        self._prefetch_translations_done = kwargs.pop(
-            "_prefetch_translations_done", False
+        """
+        Deprecated: translations are no longer cached on the queryset,
+        there is nothing left to initialize.
+        """
+        warnings.warn(
+            "QuerySetMixin.init() is deprecated and does nothing.",
+            DeprecationWarning,
+            stacklevel=2,
         )
 
     def _filter_or_exclude(self, negate, args, kwargs):
         """
         Overrides default behavior to handle linguist fields.
+
+        Linguist lookups are compiled into correlated ``EXISTS`` subqueries
+        against the decider table, so the filter stays lazy and runs in the
+        same SQL statement as the model query.
         """
-        from .models import Translation
+        if not (self.has_linguist_args(args) or self.has_linguist_kwargs(kwargs)):
+            return super(QuerySetMixin, self)._filter_or_exclude(negate, args, kwargs)
 
-        new_args = self.get_cleaned_args(args)
+        new_args = self.get_translation_args(args) + self.get_translation_kwargs(kwargs)
         new_kwargs = self.get_cleaned_kwargs(kwargs)
 
-        translation_args = self.get_translation_args(args)
-        translation_kwargs = self.get_translation_kwargs(kwargs)
-
-        has_linguist_args = self.has_linguist_args(args)
-        has_linguist_kwargs = self.has_linguist_kwargs(kwargs)
-
-        if translation_args or translation_kwargs:
-            ids = list(
-                set(
-                    Translation.objects.filter(
-                        *translation_args, **translation_kwargs
-                    ).values_list("object_id", flat=True)
-                )
-            )
-            if ids:
-                new_kwargs["id__in"] = ids
-
-        has_kwargs = has_linguist_kwargs and not (new_kwargs or new_args)
-        has_args = has_linguist_args and not (new_args or new_kwargs)
-
-        # No translations but we looked for translations?
-        # Returns empty queryset.
-        if has_kwargs or has_args:
-            return self._clone().none()
-
         return super(QuerySetMixin, self)._filter_or_exclude(
             negate, new_args, new_kwargs
         )
@@ -94,21 +113,10 @@ class QuerySetMixin(object):
             kwargs.update({"klass": klass, "setup": setup})
 
         qs = super(QuerySetMixin, self)._clone(**kwargs)
-        qs._prefetched_translations_cache = self._prefetched_translations_cache
-        qs._prefetch_translations_done = self._prefetch_translations_done
+        qs._prefetch_translations = self._prefetch_translations
 
         return qs
 
-    def iterator(self):
-        for obj in super(QuerySetMixin, self).iterator():
-            if obj and not isinstance(obj, self.model):
-                yield obj
-                continue
-
-            utils.set_object_translations_cache(obj, self)
-
-            yield obj
-
     @cached_property
     def concrete_field_names(self):
         """
@@ -155,42 +163,64 @@ class QuerySetMixin(object):
         Parses the given args and returns True if they contain
         linguist lookups.
         """
-        linguist_args = []
         for arg in args:
-            condition = self._get_linguist_condition(arg)
-            if condition:
-                linguist_args.append(condition)
-        return bool(linguist_args)
+            if self._has_linguist_condition(arg):
+                return True
+        return False
 
     def get_translation_args(self, args):
         """
-        Returns linguist args from model args.
+        Returns model args with linguist lookups compiled into subqueries.
         """
-        translation_args = []
-        for arg in args:
-            condition = self._get_linguist_condition(arg, transform=True)
-            if condition:
-                translation_args.append(condition)
-        return translation_args
+        return [self._get_linguist_condition(arg) for arg in args]
 
     def get_translation_kwargs(self, kwargs):
         """
-        Returns linguist lookup kwargs (related to Translation model).
+        Returns linguist lookup kwargs compiled into subqueries.
+
+        Lookups are grouped by translated field and language, so each
+        translation row is matched by a single subquery and conditions
+        on different fields are AND-ed together.
         """
-        lks = []
+        identifier = self.model._linguist.identifier
+
+        translation_lookups = collections.OrderedDict()
         for k, v in kwargs.items():
             if self.is_linguist_lookup(k):
-                lks.append(
-                    utils.get_translation_lookup(self.model._linguist.identifier, k, v)
+                lookup = utils.get_translation_lookup(identifier, k, v)
+                key = (
+                    lookup["field_name"],
+                    lookup["language"],
+                    "field_value__isnull" in lookup,
                 )
+                translation_lookups.setdefault(key, {}).update(lookup)
 
-        translation_kwargs = {}
-        for lk in lks:
-            for k, v in lk.items():
-                if k not in translation_kwargs:
-                    translation_kwargs[k] = v
+        return [
+            self.get_translation_subquery(lookup)
+            for lookup in translation_lookups.values()
+        ]
+
+    def get_translation_subquery(self, translation_lookup):
+        """
+        Returns an ``EXISTS`` subquery on the decider table matching
+        the given translation lookup for the outer row.
 
-        return translation_kwargs
+        A missing translation row is considered as a null value, so
+        ``isnull=True`` lookups compile to ``NOT EXISTS``.
+        """
+        translation_lookup = dict(translation_lookup)
+
+        isnull = translation_lookup.pop("field_value__isnull", False)
+        if isnull is not False:
+            translation_lookup["field_value__isnull"] = False
+
+        subquery = Exists(
+            self.model._linguist.decider.objects.filter(
+                object_id=OuterRef("pk"), **translation_lookup
+            )
+        )
+
+        return ~subquery if isnull else subquery
 
     def is_linguist_lookup(self, lookup):
         """
@@ -207,57 +237,118 @@ class QuerySetMixin(object):
 
         return False
 
-    def _get_linguist_condition(self, condition, reverse=False, transform=False):
+    def _has_linguist_condition(self, condition):
         """
-        Parses Q tree and returns linguist lookups or model lookups
-        if reverse is True.
+        Returns True if the given condition (Q tree or lookup)
+        contains linguist lookups.
         """
-        # We deal with a node
         if isinstance(condition, Q):
-            children = []
             for child in condition.children:
-                parsed = self._get_linguist_condition(
-                    condition=child, reverse=reverse, transform=transform
-                )
-                if parsed is not None:
-                    if (isinstance(parsed, Q) and parsed.children) or isinstance(
-                        parsed, tuple
-                    ):
-                        children.append(parsed)
+                if self._has_linguist_condition(child):
+                    return True
+            return False
 
-            new_condition = copy.deepcopy(condition)
-            new_condition.children = children
+        if isinstance(condition, tuple):
+            return self.is_linguist_lookup(condition[0])
 
+        return False
+
+    def _get_linguist_condition(self, condition):
+        """
+        Parses Q tree and returns a copy of it where linguist lookups
+        are replaced by their subquery.
+        """
+        # We deal with a node
+        if isinstance(condition, Q):
+            new_condition = copy.copy(condition)
+            new_condition.children = [
+                self._get_linguist_condition(child) for child in condition.children
+            ]
             return new_condition
 
         # We are dealing with a lookup ('field', 'value').
-        lookup, value = condition
-        is_linguist = self.is_linguist_lookup(lookup)
-
-        if transform and is_linguist:
-            return Q(
-                **utils.get_translation_lookup(
-                    self.model._linguist.identifier, lookup, value
+        if isinstance(condition, tuple):
+            lookup, value = condition
+            if self.is_linguist_lookup(lookup):
+                return self.get_translation_subquery(
+                    utils.get_translation_lookup(
+                        self.model._linguist.identifier, lookup, value
+                    )
                 )
-            )
 
-        if (reverse and not is_linguist) or (not reverse and is_linguist):
-            return condition
+        return condition
 
-    def get_cleaned_args(self, args):
+    def order_by(self, *field_names):
         """
-        Returns positional arguments for related model query.
+        Overrides default behavior to order by linguist fields.
         """
-        if not args:
-            return args
+        return super(QuerySetMixin, self).order_by(
+            *[self.get_translation_ordering(field_name) for field_name in field_names]
+        )
 
-        cleaned_args = []
-        for arg in args:
-            condition = self._get_linguist_condition(arg, True)
-            if condition:
-                cleaned_args.append(condition)
+    def get_translation_ordering(self, field_name):
+        """
+        Returns the ordering expression for the given linguist field name
+        (example: "-title_fr") or the field name itself for model fields.
+
+        The language-less form (example: "title") orders by the value in
+        the active language, falling back on the default language.
+        """
+        if not isinstance(field_name, str):
+            return field_name
+
+        descending = field_name.startswith("-")
+        name = field_name.lstrip("-")
+
+        if not self.is_linguist_lookup(name) or "__" in name:
+            return field_name
+
+        expression = Translated(name, fallback=name in self.model._linguist.fields)
+
+        return expression.desc() if descending else expression.asc()
+
+    def values(self, *fields, **expressions):
+        """
+        Overrides default behavior to select linguist fields.
+        """
+        return super(QuerySetMixin, self._annotate_translations(fields)).values(
+            *fields, **expressions
+        )
+
+    def values_list(self, *fields, **kwargs):
+        """
+        Overrides default behavior to select linguist fields.
+        """
+        return super(QuerySetMixin, self._annotate_translations(fields)).values_list(
+            *fields, **kwargs
+        )
+
+    def _annotate_translations(self, fields):
+        """
+        Returns a clone annotated with ``Translated`` expressions for
+        the given linguist field names.
+
+        Annotations are added to the query directly because their names
+        conflict with the (virtual) linguist fields of the model.
+        """
+        names = [
+            name
+            for name in fields
+            if isinstance(name, str)
+            and "__" not in name
+            and self.is_linguist_lookup(name)
+        ]
+
+        if not names:
+            return self
+
+        clone = self._chain()
+        for name in names:
+            clone.query.add_annotation(
+                Translated(name, fallback=name in self.model._linguist.fields), name
+            )
 
-        return cleaned_args
+        return clone
 
     def get_cleaned_kwargs(self, kwargs):
         """
@@ -276,24 +367,40 @@ class QuerySetMixin(object):
         """
         Prefetches translations.
 
-        Takes three optional keyword arguments:
+        Translations are fetched in a single query when the queryset is
+        evaluated, for the instances actually loaded.
+
+        Takes six optional keyword arguments:
 
         * ``field_names``: ``field_name`` values for SELECT IN
         * ``languages``: ``language`` values for SELECT IN
+        * ``populate_missing``: populates cache for missing translations
         * ``chunks_length``: fetches IDs by chunk
-        """
+        * ``workers``: fetches chunks concurrently with this number of threads
+        * ``related``: related lookups (``prefetch_related()`` syntax) to
+          prefetch with their translations, in one query per relation level
+        """
+        if kwargs.pop("force", None) is not None:
+            warnings.warn(
+                "with_translations() 'force' argument is deprecated and has no "
+                "effect: translations are fetched each time the queryset is "
+                "evaluated.",
+                DeprecationWarning,
+                stacklevel=2,
+            )
 
-        force = kwargs.pop("force", False)
+        related = kwargs.pop("related", None)
 
-        if self._prefetch_translations_done and force is False:
-            return self
+        qs = self._chain()
+        qs._prefetch_translations = kwargs
 
-        self._prefetched_translations_cache = utils.get_grouped_translations(
-            self, **kwargs
-        )
-        self._prefetch_translations_done = True
+        if related:
+            qs._prefetch_related_lookups = get_prefetch_related_lookups(
+                qs._prefetch_related_lookups,
+                get_translation_prefetches(self.model, related, **kwargs),
+            )
 
-        return self._clone()
+        return qs
 
     def activate_language(self, language):
         """
@@ -329,6 +436,13 @@ class ManagerMixin(object):
 
 
 class ModelMixin(object):
+    def __getstate__(self):
+        state = super(ModelMixin, self).__getstate__()
+        # Sibling links (weak references) only live as long as the queryset
+        # evaluation that set them
+        state.pop("_linguist_siblings", None)
+        return state
+
     def prefetch_translations(self, *args, **kwargs):
         if not self.pk:
             return
@@ -345,18 +459,7 @@ class ModelMixin(object):
                     value.prefetch_translations()
 
     def populate_missing_translations(self):
-        for field in self._linguist.fields:
-            if field in self._linguist.translations:
-                languages = self._linguist.translations[field]
-                missing_languages = list(
-                    set(self._linguist.supported_languages) - set(languages.keys())
-                )
-                for language in missing_languages:
-                    self._linguist.translations[field][language] = CachedTranslation()
-            else:
-                self._linguist.translations[field] = {}
-                for language in self._linguist.supported_languages:
-                    self._linguist.translations[field][language] = CachedTranslation()
+        self._linguist.populate_missing_cache()
 
     @property
     def linguist_identifier(self):
@@ -404,6 +507,7 @@ class ModelMixin(object):
         Clears Linguist cache.
         """
         self._linguist.translations.clear()
+        self._linguist.loaded_languages.clear()
 
     def get_translations(self, language=None):
         """
@@ -426,7 +530,7 @@ class ModelMixin(object):
 
     def activate_language(self, language):
         """
-        Context manager to override the instance language.
+        Activates the given ``language`` for the instance.
         """
         self._linguist.language = language
 
@@ -435,10 +539,12 @@ class ModelMixin(object):
         """
         Context manager to override the instance language.
         """
-        previous_language = self._linguist.language
+        previous_language = self._linguist._language
         self._linguist.language = language
-        yield
-        self._linguist.language = previous_language
+        try:
+            yield
+        finally:
+            self._linguist.language = previous_language
 
     def _save_table(
         self,
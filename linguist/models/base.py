@@ -3,6 +3,7 @@ from django.db import IntegrityError, models, transaction
 from django.utils.translation import gettext_lazy as _
 
 from .. import settings
+from ..cache import invalidate_translations_on_commit
 
 
 class TranslationQuerySet(models.query.QuerySet):
@@ -100,6 +101,11 @@ class TranslationManager(models.Manager):
                     self.filter(**obj.lookup).delete()
                     obj.has_changed = False
 
+            if to_create or to_update or to_delete:
+                invalidate_translations_on_commit(
+                    self.model, instance.linguist_identifier, [instance.pk], self.db
+                )
+
 
 class Translation(models.Model):
     """
@@ -157,6 +163,7 @@ class Translation(models.Model):
         index_together = [
             ["identifier", "object_id"],
             ["identifier", "object_id", "field_name"],
+            ["identifier", "field_name", "language"],
         ]
 
     def __str__(self):
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
 
 
 APP_NAMESPACE = "LINGUIST"
@@ -17,3 +18,35 @@ SUPPORTED_LANGUAGES = getattr(
 DEFAULT_LANGUAGE = getattr(
     settings, "%s_DEFAULT_LANGUAGE" % APP_NAMESPACE, settings.LANGUAGE_CODE
 )
+
+FALLBACK_LANGUAGES = getattr(settings, "%s_FALLBACK_LANGUAGES" % APP_NAMESPACE, None)
+
+PREFETCH_WORKERS = getattr(settings, "%s_PREFETCH_WORKERS" % APP_NAMESPACE, None)
+
+AUTO_PREFETCH = getattr(settings, "%s_AUTO_PREFETCH" % APP_NAMESPACE, False)
+
+PREFETCH_ON_MISS = getattr(settings, "%s_PREFETCH_ON_MISS" % APP_NAMESPACE, None)
+
+PREFETCH_LANGUAGES = getattr(settings, "%s_PREFETCH_LANGUAGES" % APP_NAMESPACE, None)
+
+CACHE_BACKEND = getattr(settings, "%s_CACHE_BACKEND" % APP_NAMESPACE, None)
+
+CACHE_PREFIX = getattr(settings, "%s_CACHE_PREFIX" % APP_NAMESPACE, "linguist")
+
+CACHE_TIMEOUT = getattr(settings, "%s_CACHE_TIMEOUT" % APP_NAMESPACE, DEFAULT_TIMEOUT)
+
+CACHE_REFILL_TIMEOUT = getattr(settings, "%s_CACHE_REFILL_TIMEOUT" % APP_NAMESPACE, 1)
+
+CACHE_REFILL_INTERVAL = getattr(
+    settings, "%s_CACHE_REFILL_INTERVAL" % APP_NAMESPACE, 0.05
+)
+
+LOCAL_CACHE_MAX_ENTRIES = getattr(
+    settings, "%s_LOCAL_CACHE_MAX_ENTRIES" % APP_NAMESPACE, None
+)
+
+LOCAL_CACHE_MAX_BYTES = getattr(
+    settings, "%s_LOCAL_CACHE_MAX_BYTES" % APP_NAMESPACE, None
+)
+
+LOCAL_CACHE_TIMEOUT = getattr(settings, "%s_LOCAL_CACHE_TIMEOUT" % APP_NAMESPACE, 300)
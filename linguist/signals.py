@@ -2,6 +2,7 @@
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
 
+from .cache import invalidate_translations_on_commit
 from .mixins import ModelMixin
 
 
@@ -14,3 +15,9 @@ def delete_translations(sender, instance, **kwargs):
         instance._linguist.decider.objects.filter(
             identifier=instance.linguist_identifier, object_id=instance.pk
         ).delete()
+        invalidate_translations_on_commit(
+            instance._linguist.decider,
+            instance.linguist_identifier,
+            [instance.pk],
+            kwargs.get("using"),
+        )
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import mimetypes
 import os
+import threading
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, TransactionTestCase
@@ -97,6 +98,29 @@ class BaseTestCase(Fixtures, TestCase):
     pass
 
 
+def run_in_threads(func, times):
+    """
+    Calls ``func`` in ``times`` threads at once, then raises the first
+    exception raised by one of them.
+    """
+    exceptions = []
+
+    def target():
+        try:
+            func()
+        except Exception as e:
+            exceptions.append(e)
+
+    threads = [threading.Thread(target=target) for i in range(times)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if exceptions:
+        raise exceptions[0]
+
+
 def get_file_path(*path_nodes):
     return os.path.join(settings.BASE_PATH, "tests", "fixtures", *path_nodes)
 
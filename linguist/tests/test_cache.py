@@ -1,9 +1,35 @@
 # -*- coding: utf-8 -*-
-from ..cache import CachedTranslation
+import pickle
+import threading
+import time
+import tracemalloc
+
+from functools import partial
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import connection
+from django.utils.functional import cached_property
+
+from .. import settings
+from ..cache import (
+    CachedTranslation,
+    StoredTranslation,
+    LocalCache,
+    get_local_cache,
+    get_rows_size,
+    get_shared_translations,
+    get_translation_field_names,
+    invalidate_translations,
+    refill_translations,
+)
+from ..fields import CacheDescriptor
+from ..helpers import prefetch_translations
 from ..models import Translation
+from ..utils import get_grouped_translations, query_translations
 
-from .base import BaseTestCase
-from .models import FooModel
+from .base import BaseTestCase, BaseTransactionTestCase, run_in_threads
+from .models import Article, FooModel, SlugModel
 
 
 class CachedTranslationTest(BaseTestCase):
@@ -57,3 +83,478 @@ class CachedTranslationTest(BaseTestCase):
         self.assertEqual(obj.language, translation.language)
         self.assertEqual(obj.field_name, translation.field_name)
         self.assertEqual(obj.field_value, translation.field_value)
+
+    def test_from_values(self):
+        self.instance.activate_language("en")
+        self.instance.title = "Hello"
+        self.instance.save()
+
+        values = Translation.objects.values_list(*get_translation_field_names()).first()
+        obj = CachedTranslation.from_values(values)
+
+        translation = Translation.objects.first()
+        self.assertFalse(obj.is_new)
+        self.assertFalse(obj.has_changed)
+        self.assertEqual(obj.identifier, translation.identifier)
+        self.assertEqual(obj.object_id, translation.object_id)
+        self.assertEqual(obj.language, translation.language)
+        self.assertEqual(obj.field_name, translation.field_name)
+        self.assertEqual(obj.field_value, translation.field_value)
+        self.assertEqual(obj.attrs, CachedTranslation.from_object(translation).attrs)
+
+
+class TranslationStoreTest(BaseTestCase):
+    """
+    Tests instances translations store.
+    """
+
+    def test_store(self):
+        instance = FooModel.objects.get(pk=self.translated_instance.pk)
+        store = instance._linguist.translations
+
+        instance.prefetch_translations(languages=["en", "fr"])
+
+        # Values are stored in a flat list, translations are views
+        self.assertEqual(len(store.values), 3 * len(self.languages))
+        self.assertEqual(store.keys().count(("title", "en")), 1)
+        self.assertEqual(len(store.keys()), 2)
+        self.assertIsInstance(store["title"]["fr"], StoredTranslation)
+        self.assertEqual(store["title"]["fr"].field_value, "fr")
+        self.assertEqual(store["title"].get("it"), None)
+        self.assertEqual(sorted(store["title"].keys()), ["en", "fr"])
+        self.assertEqual(instance._linguist.cached_languages, ["en", "fr"])
+        self.assertEqual(instance._linguist.cached_fields, ["title"])
+
+        # Missing translations are known-absent slots, not entries
+        self.assertFalse(store["title"]["fr"].is_new)
+        self.assertTrue(store["body"]["fr"].is_new)
+        self.assertIsNone(store["body"]["fr"].field_value)
+        self.assertTrue(store["body"].is_absent("fr"))
+        self.assertNotIn("fr", store["body"])
+        self.assertNotIn("fr", store["body"].keys())
+        self.assertNotIn("it", store["body"])
+        self.assertFalse(store["body"].is_absent("it"))
+        self.assertNotIn(("body", "fr"), store.keys())
+
+        # Changes are tracked in bitmasks
+        instance.activate_language("fr")
+        instance.title = "Titre"
+        self.assertTrue(store["title"]["fr"].has_changed)
+        self.assertFalse(store["title"]["en"].has_changed)
+        instance.title = None
+        self.assertTrue(store["title"]["fr"].deleted)
+
+        # Writing a missing translation creates its entry
+        instance.body = "Corps"
+        self.assertIn(("body", "fr"), store.keys())
+        self.assertEqual(store["body"]["fr"].field_value, "Corps")
+        self.assertNotIn(("body", "en"), store.keys())
+
+        # Unknown languages are stored aside
+        store["title"]["xx"] = CachedTranslation(field_value="Unknown")
+        self.assertEqual(store["title"]["xx"].field_value, "Unknown")
+        self.assertIn("xx", instance._linguist.cached_languages)
+
+        # Instances can be pickled
+        instance.title_fr = "Titre"
+        clone = pickle.loads(pickle.dumps(instance))
+        with self.assertNumQueries(0):
+            self.assertEqual(clone.title_fr, "Titre")
+            self.assertEqual(clone.body_en, "")
+        with self.assertNumQueries(1):
+            self.assertEqual(clone.title_it, "it")
+
+    def test_dashed_language(self):
+        languages = list(settings.SUPPORTED_LANGUAGES) + [("pt-br", "Brazilian")]
+        Translation.objects.create(
+            identifier="foo",
+            object_id=self.translated_instance.pk,
+            language="pt-br",
+            field_name="title",
+            field_value="pt-br",
+        )
+
+        with mock.patch.object(settings, "SUPPORTED_LANGUAGES", languages):
+            descriptor = CacheDescriptor(FooModel._meta.linguist)
+            with mock.patch.object(FooModel, "_linguist", descriptor):
+                instance = FooModel.objects.get(pk=self.translated_instance.pk)
+                instance.prefetch_translations()
+                store = instance._linguist.translations
+
+                # Stored in the layout, with settings codes
+                self.assertEqual(descriptor.layout.languages[-1], "pt-br")
+                self.assertFalse(store.extra)
+                self.assertEqual(store["title"]["pt-br"].field_value, "pt-br")
+                self.assertTrue(store["body"].is_absent("pt-br"))
+                self.assertIn("pt-br", instance._linguist.loaded_languages)
+
+
+class DictCachedTranslation(object):
+    """
+    Previous ``CachedTranslation`` layout (instance ``__dict__`` and cached
+    ``attrs`` / ``lookup`` dicts), used as memory benchmark reference.
+    """
+
+    @cached_property
+    def attrs(self):
+        return dict((k, getattr(self, k)) for k in self.fields)
+
+    @cached_property
+    def lookup(self):
+        lookup = dict((k, getattr(self, k)) for k in self.fields)
+        for field_name in ["field_value", "updated_at"]:
+            lookup.pop(field_name)
+        return lookup
+
+    @classmethod
+    def from_values(cls, values):
+        fields = get_translation_field_names()
+        instance = cls.__new__(cls)
+        instance.__dict__.update(zip(fields, values))
+        instance.fields = fields
+        instance.instance = None
+        instance.translation = None
+        instance.is_new = False
+        instance.has_changed = False
+        instance.deleted = False
+        return instance
+
+
+def get_entry_size(cls, count=2000):
+    """
+    Returns memory allocated per cache entry (traced by tracemalloc) when
+    building ``count`` entries and reading their ``attrs`` and ``lookup``.
+    """
+    values = ("foo", 1, "en", "title", "Hello", None)
+
+    tracemalloc.start()
+    try:
+        entries = [cls.from_values(values) for i in range(count)]
+        for entry in entries:
+            entry.attrs
+            entry.lookup
+        size, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return size / count
+
+
+class CachedTranslationMemoryTest(BaseTestCase):
+    """
+    Benchmarks CachedTranslation memory footprint.
+    """
+
+    def test_entry_size(self):
+        before = get_entry_size(DictCachedTranslation)
+        after = get_entry_size(CachedTranslation)
+
+        # About 1450 bytes before, 140 bytes after (CPython 3.11)
+        self.assertLess(after * 4, before)
+
+    def test_extra_fields(self):
+        obj = CachedTranslation(field_name="title", custom="value")
+
+        self.assertEqual(obj.custom, "value")
+        self.assertIsNone(obj.language)
+        with self.assertRaises(AttributeError):
+            obj.unknown
+
+
+class SharedCacheTest(BaseTestCase):
+    """
+    Tests translations shared cache.
+    """
+
+    def setUp(self):
+        super(SharedCacheTest, self).setUp()
+        caches["default"].clear()
+        patcher = mock.patch.object(settings, "CACHE_BACKEND", "default")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_articles(self):
+        return list(Article.objects.filter(pk__in=[a.pk for a in self.articles]))
+
+    def test_prefetch_translations(self):
+        articles = self.get_articles()
+
+        # 1 - SELECT IN translation, then stored in cache
+        with self.assertNumQueries(1):
+            prefetch_translations(articles)
+
+        # Other instances (as in another request) read the shared cache
+        articles = self.get_articles()
+        with self.assertNumQueries(0):
+            prefetch_translations(articles)
+            for i, article in enumerate(articles):
+                self.assertEqual(article.title_fr, "%d in FR" % i)
+                self.assertEqual(article.title_de, "")
+
+        # Saving translations invalidates the object entries only
+        articles[0].title_fr = "Nouveau titre"
+        articles[0].save()
+
+        articles = self.get_articles()
+        with self.assertNumQueries(1):
+            prefetch_translations(articles)
+        self.assertEqual(articles[0].title_fr, "Nouveau titre")
+        self.assertEqual(articles[1].title_fr, "1 in FR")
+
+        # Deleting the object invalidates its entries too
+        pk = articles[0].pk
+        articles[0].delete()
+        self.assertFalse(
+            Translation.objects.filter(identifier="article", object_id=pk).exists()
+        )
+        article = Article(pk=pk)
+        with self.assertNumQueries(1):
+            prefetch_translations([article])
+        self.assertEqual(article.title_fr, "")
+
+    def test_get_cache(self):
+        article = Article.objects.get(pk=self.articles[0].pk)
+
+        # 1 - SELECT translations in French, then stored in cache
+        with self.assertNumQueries(1):
+            self.assertEqual(article.title_fr, "0 in FR")
+            self.assertEqual(article.content_fr, "0 FR")
+
+        article = Article.objects.get(pk=self.articles[0].pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(article.title_fr, "0 in FR")
+
+        # Entries are shared with prefetching (by language)
+        with self.assertNumQueries(0):
+            prefetch_translations([article], languages=["fr"])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(article.title_en, "0 in EN")
+
+    def test_invalidate_during_refill(self):
+        obj = ("article", self.articles[0].pk)
+
+        def fetch(objects):
+            rows = list(query_translations(Translation, objects))
+            # Saved (and invalidated) after the read, before the refill
+            invalidate_translations(Translation, obj[0], [obj[1]])
+            return rows
+
+        refill_translations(Translation, [obj], ["fr"], fetch)
+
+        # Stale rows were stored under the previous version
+        self.assertEqual(get_shared_translations(Translation, [obj], ["fr"]), {})
+
+    def test_invalidate_on_commit(self):
+        article = self.get_articles()[0]
+        obj = ("article", article.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            article.title_fr = "Nouveau titre"
+            article.save()
+            # Refilled (by another connection) before the commit
+            prefetch_translations(self.get_articles())
+            self.assertIn(obj, get_shared_translations(Translation, [obj], ["fr"]))
+
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertEqual(get_shared_translations(Translation, [obj], ["fr"]), {})
+
+
+class LocalCacheTest(BaseTestCase):
+    """
+    Tests translations process-local cache.
+    """
+
+    def setUp(self):
+        super(LocalCacheTest, self).setUp()
+        patcher = mock.patch.object(settings, "LOCAL_CACHE_MAX_ENTRIES", 100)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_local_cache().clear()
+
+    def test_lru(self):
+        cache = LocalCache(max_entries=2)
+        rows = {"en": [("foo", 1, "en", "title", "Hello", None)]}
+
+        cache.set_many(Translation, {("foo", 1): rows, ("foo", 2): rows})
+        self.assertEqual(len(cache.get_many(Translation, [("foo", 1)], ["en"])), 1)
+
+        # ("foo", 2) is the least recently used entry
+        cache.set_many(Translation, {("foo", 3): rows})
+        found = cache.get_many(
+            Translation, [("foo", 1), ("foo", 2), ("foo", 3)], ["en"]
+        )
+        self.assertEqual(set(found), set([("foo", 1), ("foo", 3)]))
+
+        # Missing languages are cache misses
+        self.assertEqual(cache.get_many(Translation, [("foo", 1)], ["en", "fr"]), {})
+
+        stats = cache.stats
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_bounds(self):
+        rows = {"en": [("foo", 1, "en", "title", "x" * 1000, None)]}
+
+        # Byte budget
+        max_bytes = get_rows_size(rows) * 2.5
+        cache = LocalCache(max_entries=10, max_bytes=max_bytes)
+        cache.set_many(Translation, {("foo", i): rows for i in range(5)})
+        self.assertLessEqual(cache.stats["bytes"], max_bytes)
+        self.assertEqual(cache.stats["entries"], 2)
+        self.assertEqual(cache.stats["evictions"], 3)
+
+        # Time to live
+        cache = LocalCache(max_entries=10, timeout=60)
+        with mock.patch("linguist.cache.time.monotonic", return_value=1000):
+            cache.set_many(Translation, {("foo", 1): rows})
+        with mock.patch("linguist.cache.time.monotonic", return_value=1059):
+            self.assertEqual(len(cache.get_many(Translation, [("foo", 1)], ["en"])), 1)
+        with mock.patch("linguist.cache.time.monotonic", return_value=1060):
+            self.assertEqual(cache.get_many(Translation, [("foo", 1)], ["en"]), {})
+        self.assertEqual(cache.stats["entries"], 0)
+
+    def test_invalidate_during_refill(self):
+        obj = ("article", self.articles[0].pk)
+        cache = get_local_cache()
+
+        def fetch(objects):
+            rows = list(query_translations(Translation, objects))
+            # Saved (and invalidated) after the read, before the refill
+            invalidate_translations(Translation, obj[0], [obj[1]])
+            return rows
+
+        refill_translations(Translation, [obj], ["fr"], fetch)
+        self.assertEqual(cache.get_many(Translation, [obj], ["fr"]), {})
+
+        # Rows read after the invalidation are stored
+        refill_translations(
+            Translation, [obj], ["fr"], partial(query_translations, Translation)
+        )
+        self.assertEqual(len(cache.get_many(Translation, [obj], ["fr"])), 1)
+
+    def test_dashed_language(self):
+        languages = list(settings.SUPPORTED_LANGUAGES) + [("pt-br", "Brazilian")]
+        pk = self.articles[0].pk
+        Translation.objects.create(
+            identifier="article",
+            object_id=pk,
+            language="pt-br",
+            field_name="title",
+            field_value="0 in PT-BR",
+        )
+
+        with mock.patch.object(settings, "SUPPORTED_LANGUAGES", languages):
+            # Cached rows are grouped by language code as stored ("pt-br")
+            for i in range(2):
+                grouped = get_grouped_translations([Article(pk=pk)])
+                values = [translation.field_value for translation in grouped[pk]]
+                self.assertIn("0 in PT-BR", values)
+
+    def test_get_cache(self):
+        pk = self.articles[0].pk
+
+        # 1 - SELECT translations in French, then stored in local cache
+        article = Article.objects.get(pk=pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(article.title_fr, "0 in FR")
+            self.assertEqual(article.content_fr, "0 FR")
+
+        # New instances do not start cold
+        article = Article.objects.get(pk=pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(article.title_fr, "0 in FR")
+            prefetch_translations([article], languages=["fr"])
+
+        # Saving translations invalidates the object entry
+        article.title_fr = "Nouveau titre"
+        article.save()
+
+        article = Article.objects.get(pk=pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(article.title_fr, "Nouveau titre")
+
+
+class SingleFlightTest(BaseTransactionTestCase):
+    """
+    Tests single-flight cache refills.
+    """
+
+    def setUp(self):
+        super(SingleFlightTest, self).setUp()
+        patcher = mock.patch.object(settings, "LOCAL_CACHE_MAX_ENTRIES", 100)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_local_cache().clear()
+
+    def test_single_flight_refill(self):
+        instance = SlugModel(slug="hot")
+        for language in ("en", "fr"):
+            instance.activate_language(language)
+            instance.title = "Title in %s" % language
+        instance.save()
+
+        queries = []
+        results = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(10)
+
+        def slow_query_translations(*args, **kwargs):
+            with lock:
+                queries.append(args)
+            # Leaves time to other threads to miss the cache
+            time.sleep(0.2)
+            return query_translations(*args, **kwargs)
+
+        def get_translations():
+            try:
+                barrier.wait()
+                translations = get_grouped_translations([instance])
+                with lock:
+                    results.append(sorted(str(t) for t in translations[instance.pk]))
+            finally:
+                connection.close()
+
+        with mock.patch("linguist.utils.query_translations", slow_query_translations):
+            run_in_threads(get_translations, 10)
+
+        # A single refill query for the burst of cache misses
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(len(results), 10)
+        for result in results:
+            self.assertEqual(result, results[0])
+        self.assertEqual(len(results[0]), 2)
+
+    def test_wait_other_language(self):
+        obj = ("foo", 1)
+        fetching = threading.Event()
+        done = threading.Event()
+        fetched = []
+
+        def slow_fetch(objects):
+            fetching.set()
+            done.wait(1)
+            return []
+
+        def fetch(objects):
+            fetched.append(objects)
+            return []
+
+        leader = threading.Thread(
+            target=refill_translations, args=(Translation, [obj], ["en"], slow_fetch)
+        )
+        leader.start()
+        fetching.wait(1)
+
+        # Rows of another language: fetched once the leader is done, without
+        # polling caches until the refill timeout
+        with mock.patch("linguist.cache.time.sleep") as sleep:
+            threading.Timer(0.05, done.set).start()
+            refill_translations(Translation, [obj], ["fr"], fetch)
+        leader.join()
+
+        self.assertEqual(fetched, [[obj]])
+        self.assertFalse(sleep.called)
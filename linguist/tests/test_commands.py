@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import threading
+
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+
+from .. import settings
+from ..cache import get_shared_translations
+from ..helpers import prefetch_translations
+from ..models import Translation
+
+from .base import BaseTestCase, BaseTransactionTestCase
+from .models import Article, SlugModel
+
+
+class WarmCacheCommandTest(BaseTestCase):
+    """
+    Tests linguist_warm_cache command.
+    """
+
+    def setUp(self):
+        super(WarmCacheCommandTest, self).setUp()
+        caches["default"].clear()
+        patcher = mock.patch.object(settings, "CACHE_BACKEND", "default")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_warm_cache(self):
+        articles = list(Article.objects.filter(pk__in=[a.pk for a in self.articles]))
+
+        objects = [("article", article.pk) for article in articles]
+        self.translated_instance
+
+        # 1 query streaming objects, then 1 query per batch of 3 objects
+        out = StringIO()
+        with self.assertNumQueries(5):
+            call_command(
+                "linguist_warm_cache",
+                identifiers=["article"],
+                languages=["en", "fr"],
+                batch_size=3,
+                stdout=out,
+            )
+        self.assertIn("Loaded 40 translations of 10 objects", out.getvalue())
+
+        cached = get_shared_translations(Translation, objects, ["en", "fr"])
+        self.assertEqual(set(cached), set(objects))
+        self.assertEqual(
+            sorted(row[4] for row in cached[objects[0]]["fr"]), ["0 FR", "0 in FR"]
+        )
+
+        # Other identifiers were not loaded
+        self.assertEqual(
+            get_shared_translations(
+                Translation, [("foo", self.translated_instance.pk)], ["en"]
+            ),
+            {},
+        )
+
+        with self.assertNumQueries(0):
+            prefetch_translations(articles, languages=["en", "fr"])
+        self.assertEqual(articles[0].title_fr, "0 in FR")
+
+    def test_filters(self):
+        self.articles
+
+        out = StringIO()
+        call_command(
+            "linguist_warm_cache",
+            identifiers=["article"],
+            min_id=self.articles[2].pk,
+            max_id=self.articles[4].pk,
+            updated_after="2000-01-01T00:00:00",
+            stdout=out,
+        )
+        self.assertIn("of 3 objects", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("linguist_warm_cache", updated_after="yesterday")
+
+    def test_no_cache(self):
+        # A local cache alone is not warmed up
+        with mock.patch.object(settings, "CACHE_BACKEND", None):
+            with mock.patch.object(settings, "LOCAL_CACHE_MAX_ENTRIES", 100):
+                with self.assertRaises(CommandError):
+                    call_command("linguist_warm_cache")
+
+
+class ParallelWarmCacheCommandTest(BaseTransactionTestCase):
+    """
+    Tests linguist_warm_cache command with worker threads.
+    """
+
+    def setUp(self):
+        super(ParallelWarmCacheCommandTest, self).setUp()
+        caches["default"].clear()
+        patcher = mock.patch.object(settings, "CACHE_BACKEND", "default")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_workers(self):
+        for i in range(10):
+            instance = SlugModel(slug="slug-%d" % i)
+            for language in ("en", "fr"):
+                instance.activate_language(language)
+                instance.title = "Title %d in %s" % (i, language)
+            instance.save()
+
+        objects = [
+            (instance.linguist_identifier, instance.pk)
+            for instance in SlugModel.objects.all()
+        ]
+
+        closed = []
+        wrapper_class = connections["default"].__class__
+        close = wrapper_class.close
+
+        def record_close(wrapper):
+            closed.append(threading.get_ident())
+            close(wrapper)
+
+        out = StringIO()
+        with mock.patch.object(
+            wrapper_class, "close", autospec=True, side_effect=record_close
+        ):
+            call_command(
+                "linguist_warm_cache",
+                batch_size=2,
+                workers=3,
+                max_bytes=10**6,
+                stdout=out,
+            )
+        self.assertIn("Loaded 20 translations of 10 objects", out.getvalue())
+
+        cached = get_shared_translations(Translation, objects, ["en", "fr"])
+        self.assertEqual(set(cached), set(objects))
+
+        # 5 batches, connections closed once per worker thread
+        self.assertEqual(len(closed), 3)
+        self.assertNotIn(threading.get_ident(), closed)
@@ -2,15 +2,34 @@
 from __future__ import unicode_literals
 
 import datetime
+import pickle
+import re
+
+from unittest import mock
 
 from django.core.exceptions import FieldError
+from django.db import connection
 from django.db.models import Q
+from django.db.models.signals import post_init
+from django.test.utils import CaptureQueriesContext
 from django.utils import translation
 
+from .. import settings
+from .. import utils
+from ..expressions import Translated
+from ..helpers import prefetch_translations
 from ..models import Translation
 
 from .base import BaseTestCase
-from .models import FooModel, Article
+from .models import (
+    Article,
+    Author,
+    DeciderModel,
+    DefaultLanguageFieldModel,
+    FooModel,
+    SlugModel,
+    Tag,
+)
 
 
 class ManagerMixinTest(BaseTestCase):
@@ -47,12 +66,16 @@ class ManagerMixinTest(BaseTestCase):
             self.instance.activate_language("fr")
             fr_title = "%s" % self.instance.title  # noqa
 
+        # Preloading is lazy
+        with self.assertNumQueries(0):
+            FooModel.objects.with_translations()
+
         # Preload translations without clearing the cache
         #
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            FooModel.objects.with_translations()
+            list(FooModel.objects.with_translations())
 
         # Clear cache
         self.instance.clear_translations_cache()
@@ -63,13 +86,13 @@ class ManagerMixinTest(BaseTestCase):
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            instances = FooModel.objects.with_translations()
+            instances = list(FooModel.objects.with_translations())
 
         instance = instances[0]
 
         # Database should be not hit
         with self.assertNumQueries(0):
-            self.assertEqual(instance.cached_translations_count, 18)
+            self.assertEqual(instance.cached_translations_count, 2)
 
         articles = self.articles
 
@@ -81,14 +104,17 @@ class ManagerMixinTest(BaseTestCase):
                 ]
                 self.assertEqual(len(values), 10)
 
-        # 1 - article
-        # 2 - translations
-        with self.assertNumQueries(2):
+        with self.assertNumQueries(0):
             qs = Article.objects.filter(slug="article-1").with_translations()
 
         # Test get() and qs[0]
-        article_qs = qs[0]
-        article_get = qs.get()
+        #
+        # 1 - article
+        # 2 - translations
+        with self.assertNumQueries(2):
+            article_qs = qs[0]
+        with self.assertNumQueries(2):
+            article_get = qs.get()
         attrs = article_qs._linguist.fields + [
             "_linguist_translations",
             "_linguist_cache",
@@ -106,6 +132,23 @@ class ManagerMixinTest(BaseTestCase):
                     for lang in ("fr", "en"):
                         value = getattr(instance, "%s_%s" % (attr, lang))
 
+    def test_deprecated_api(self):
+        instance = self.translated_instance
+
+        with self.assertWarns(DeprecationWarning):
+            qs = FooModel.objects.with_translations(force=True)
+        with self.assertNumQueries(2):
+            self.assertEqual(list(qs)[0].title_fr, "fr")
+
+        with self.assertWarns(DeprecationWarning):
+            qs.init()
+
+        obj = FooModel.objects.get(pk=instance.pk)
+        with self.assertWarns(DeprecationWarning):
+            utils.set_object_translations_cache(obj, qs)
+        with self.assertNumQueries(0):
+            self.assertEqual(obj.title_it, "it")
+
     def test_with_translations_args(self):
         # Create English content
         self.instance.activate_language("en")
@@ -128,12 +171,16 @@ class ManagerMixinTest(BaseTestCase):
         with self.assertNumQueries(4):
             self.instance.save()
 
+        # Preloading is lazy
+        with self.assertNumQueries(0):
+            FooModel.objects.with_translations()
+
         # Preload translations without clearing the cache
         #
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            FooModel.objects.with_translations()
+            list(FooModel.objects.with_translations())
 
         # Clear cache
         self.instance.clear_translations_cache()
@@ -144,12 +191,12 @@ class ManagerMixinTest(BaseTestCase):
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            instances = FooModel.objects.with_translations(field_names=("title",))
+            instances = list(FooModel.objects.with_translations(field_names=("title",)))
 
         self.instance = instances[0]
 
         # Cache has been cleared and we got now the two titles
-        self.assertEqual(self.instance.cached_translations_count, 18)
+        self.assertEqual(self.instance.cached_translations_count, 2)
 
         # Verify dict
         with self.assertNumQueries(0):
@@ -165,14 +212,15 @@ class ManagerMixinTest(BaseTestCase):
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            instances = FooModel.objects.with_translations(
-                field_names=("title", "body")
+            instances = list(
+                FooModel.objects.with_translations(field_names=("title", "body"))
             )
 
         self.instance = instances[0]
 
-        # Cached has been cleared. We should have title/body for each language
-        self.assertEqual(self.instance.cached_translations_count, 18)
+        # Cached has been cleared. We should have title/body for each
+        # existing translation
+        self.assertEqual(self.instance.cached_translations_count, 4)
 
         # Verify dict
         self.assertTrue(self.instance._linguist.translations["title"]["fr"])
@@ -189,14 +237,17 @@ class ManagerMixinTest(BaseTestCase):
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            instances = FooModel.objects.with_translations(
-                field_names=("title", "excerpt"), languages=("en",)
+            instances = list(
+                FooModel.objects.with_translations(
+                    field_names=("title", "excerpt"), languages=("en",)
+                )
             )
 
         self.instance = instances[0]
 
         # Cache has been cleared. We should have title/excerpt for English only.
-        self.assertEqual(self.instance.cached_translations_count, 18)
+        # Other languages are not cached: they are loaded on demand.
+        self.assertEqual(self.instance.cached_translations_count, 2)
 
         # Verify dict
         self.assertTrue(self.instance._linguist.translations["title"]["en"])
@@ -211,14 +262,16 @@ class ManagerMixinTest(BaseTestCase):
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            instances = FooModel.objects.with_translations(
-                field_names=("title", "excerpt", "body"), languages=("fr",)
+            instances = list(
+                FooModel.objects.with_translations(
+                    field_names=("title", "excerpt", "body"), languages=("fr",)
+                )
             )
 
         self.instance = instances[0]
 
         # Cache has been cleared. We should have title/excerpt/body for French only
-        self.assertEqual(self.instance.cached_translations_count, 18)
+        self.assertEqual(self.instance.cached_translations_count, 3)
 
         # Verify dict
         self.assertTrue(self.instance._linguist.translations["title"]["fr"])
@@ -230,14 +283,16 @@ class ManagerMixinTest(BaseTestCase):
         # 1 - SELECT ALL foomodel
         # 2 - SELECT IN translation
         with self.assertNumQueries(2):
-            instances = FooModel.objects.with_translations(
-                field_names=("title",), languages=("fr", "en")
+            instances = list(
+                FooModel.objects.with_translations(
+                    field_names=("title",), languages=("fr", "en")
+                )
             )
 
         self.instance = instances[0]
 
         # Cache has been cleared. We should have titles for French and English
-        self.assertEqual(self.instance.cached_translations_count, 18)
+        self.assertEqual(self.instance.cached_translations_count, 2)
 
         # Verify dict
         self.assertTrue(self.instance._linguist.translations["title"]["fr"])
@@ -436,3 +491,448 @@ class ManagerMixinTest(BaseTestCase):
             ).count(),
             1,
         )
+
+    def test_lookup_subquery(self):
+        for i in range(5):
+            m = FooModel()
+            m.activate_language("fr")
+            m.title = "Titre %d" % i
+            m.save()
+
+        # Filtering is lazy
+        with self.assertNumQueries(0):
+            qs = FooModel.objects.filter(title_fr__icontains="titre")
+
+        # Translations are matched in the same statement
+        sql = str(qs.query).upper()
+        self.assertIn("EXISTS", sql)
+        self.assertNotIn(" IN (", sql)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(qs.count(), 5)
+        with self.assertNumQueries(1):
+            self.assertTrue(qs.exists())
+        with self.assertNumQueries(1):
+            self.assertEqual(len(qs.order_by("pk")[1:3]), 2)
+
+        # Combined with concrete lookups
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                FooModel.objects.filter(title_fr="Titre 1", is_published=False).count(),
+                1,
+            )
+
+    def test_lookup_decider(self):
+        m = DeciderModel()
+        m.activate_language("fr")
+        m.title = "Bonjour"
+        m.save()
+
+        self.assertEqual(DeciderModel.objects.filter(title_fr="Bonjour").count(), 1)
+        self.assertEqual(Translation.objects.count(), 0)
+
+    def test_lookup_multiple_fields(self):
+        m = FooModel()
+        m.activate_language("fr")
+        m.title = "a"
+        m.excerpt = "b"
+        m.body = "c"
+        m.save()
+
+        other = FooModel()
+        other.activate_language("fr")
+        other.title = "a"
+        other.excerpt = "x"
+        other.body = "y"
+        other.save()
+
+        # Second condition must not be dropped
+        self.assertEqual(
+            list(FooModel.objects.filter(title_fr="a", excerpt_fr__contains="b")), [m]
+        )
+        self.assertEqual(
+            list(FooModel.objects.filter(title_fr="a", body_fr="y")), [other]
+        )
+        self.assertEqual(
+            FooModel.objects.filter(title_fr="a", body_fr="c", excerpt_fr="x").count(),
+            0,
+        )
+
+        # Lookups on the same field share one subquery
+        qs = FooModel.objects.filter(title_fr__startswith="a", title_fr__endswith="a")
+        self.assertEqual(str(qs.query).upper().count("EXISTS"), 1)
+        self.assertEqual(qs.count(), 2)
+
+        # One statement whatever the number of translated fields
+        lookups = {}
+        for field, value in (("excerpt", "b"), ("title", "a"), ("body", "c")):
+            lookups["%s_fr" % field] = value
+            qs = FooModel.objects.filter(**lookups)
+            self.assertEqual(str(qs.query).upper().count("EXISTS"), len(lookups))
+            with self.assertNumQueries(1):
+                self.assertEqual(list(qs), [m])
+
+    def test_exclude_lookup(self):
+        hello = FooModel(title_en="Hello", title_fr="Bonjour", is_published=True)
+        hello.save()
+        bye = FooModel(title_en="Bye", title_fr="Au revoir")
+        bye.save()
+        empty = FooModel()
+        empty.save()
+
+        # Objects without translation are kept
+        qs = FooModel.objects.exclude(title_fr="Bonjour").order_by("pk")
+        self.assertRegex(str(qs.query).upper(), r"NOT \(?EXISTS")
+        self.assertEqual(list(qs), [bye, empty])
+
+        self.assertEqual(
+            list(FooModel.objects.filter(~Q(title_fr__contains="o")).order_by("pk")),
+            [empty],
+        )
+        self.assertEqual(
+            list(
+                FooModel.objects.filter(
+                    Q(is_published=True) | ~Q(title_en__startswith="B")
+                ).order_by("pk")
+            ),
+            [hello, empty],
+        )
+        self.assertEqual(
+            list(FooModel.objects.exclude(title_fr="Bonjour", title_en="Hello")),
+            list(FooModel.objects.exclude(pk=hello.pk)),
+        )
+
+        # Missing translations are null values
+        self.assertEqual(list(FooModel.objects.filter(title_fr__isnull=True)), [empty])
+        self.assertEqual(FooModel.objects.filter(title_fr__isnull=False).count(), 2)
+        self.assertEqual(FooModel.objects.exclude(title_fr__isnull=True).count(), 2)
+
+        # Still lazy and composable with other querysets
+        with self.assertNumQueries(0):
+            excluded = FooModel.objects.exclude(title_en="Hello")
+            qs = FooModel.objects.filter(pk__in=excluded.values("pk")).filter(
+                title_fr__isnull=False
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(list(qs), [bye])
+
+    def test_order_by(self):
+        b = FooModel(title_en="b", title_fr="c")
+        b.save()
+        a = FooModel(title_en="a")
+        a.save()
+        c = FooModel(title_en="c", title_fr="0")
+        c.save()
+
+        with self.assertNumQueries(0):
+            qs = FooModel.objects.order_by("title_fr", "pk")
+
+        # Missing translations sort as NULL: only check translated ones
+        self.assertEqual([o for o in qs if o.pk != a.pk], [c, b])
+        self.assertEqual(list(FooModel.objects.order_by("-title_en")), [c, b, a])
+        self.assertEqual(list(FooModel.objects.order_by("title_en")[:2]), [a, b])
+
+        # Active language, then default language
+        translation.activate("fr")
+        self.assertEqual(list(FooModel.objects.order_by("title")), [c, a, b])
+        self.assertEqual(list(FooModel.objects.order_by("-title")), [b, a, c])
+
+        translation.activate("en")
+        self.assertEqual(list(FooModel.objects.order_by("title")), [a, b, c])
+
+        # Combined with translated filters
+        self.assertEqual(
+            list(FooModel.objects.filter(title_fr__isnull=False).order_by("title")),
+            [b, c],
+        )
+
+    def test_order_by_default_language_field(self):
+        fr = DefaultLanguageFieldModel(title_fr="b", title_en="z", lang="fr")
+        fr.save()
+        en = DefaultLanguageFieldModel(title_en="a", lang="en")
+        en.save()
+
+        translation.activate("it")
+        self.assertEqual(
+            list(DefaultLanguageFieldModel.objects.order_by("title")), [en, fr]
+        )
+        translation.activate("en")
+
+    def test_translated_expression(self):
+        hello = FooModel(title_en="Hello", title_fr="Bonjour", body_en="Body")
+        hello.save()
+        empty = FooModel(title_en="Empty")
+        empty.save()
+
+        qs = FooModel.objects.order_by("pk")
+
+        # annotate()
+        with self.assertNumQueries(1):
+            instances = list(
+                qs.annotate(
+                    fr=Translated("title", language="fr"),
+                    fr_or_en=Translated("title_fr", fallback=True),
+                )
+            )
+        self.assertEqual([i.fr for i in instances], ["Bonjour", None])
+        self.assertEqual([i.fr_or_en for i in instances], ["Bonjour", "Empty"])
+
+        # values() and values_list() with linguist field names
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(qs.values("pk", "title_fr", "body_en")),
+                [
+                    {"pk": hello.pk, "title_fr": "Bonjour", "body_en": "Body"},
+                    {"pk": empty.pk, "title_fr": None, "body_en": None},
+                ],
+            )
+        self.assertEqual(
+            list(qs.values_list("title_en", flat=True)), ["Hello", "Empty"]
+        )
+
+        translation.activate("fr")
+        self.assertEqual(
+            list(qs.values_list("pk", "title")),
+            [(hello.pk, "Bonjour"), (empty.pk, "Empty")],
+        )
+        self.assertEqual(
+            list(qs.values(en=Translated("title", language="en"))),
+            [{"en": "Hello"}, {"en": "Empty"}],
+        )
+        translation.activate("en")
+
+        # Comparisons
+        self.assertEqual(
+            list(qs.annotate(fr=Translated("title_fr")).filter(fr__startswith="Bon")),
+            [hello],
+        )
+        slug = SlugModel(slug="hello", title_en="hello")
+        slug.save()
+        SlugModel(slug="bye", title_en="hello").save()
+        self.assertEqual(
+            list(SlugModel.objects.filter(slug=Translated("title_en"))), [slug]
+        )
+
+        self.assertRaises(FieldError, qs.annotate, t=Translated("unknown"))
+
+    def test_with_translations_lazy(self):
+        articles = self.articles
+
+        # Never evaluated, never fetched
+        with self.assertNumQueries(0):
+            qs = Article.objects.with_translations().order_by("pk")
+
+        # Model rows are fetched once, then translations
+        with CaptureQueriesContext(connection) as context:
+            instances = list(qs)
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertEqual(len(instances), 10)
+
+        # Slicing after with_translations() limits the translation fetch
+        with CaptureQueriesContext(connection) as context:
+            page = list(qs.all()[2:4])
+        self.assertEqual(page, articles[2:4])
+        self.assertEqual(len(context.captured_queries), 2)
+        ids = re.search(
+            r'"object_id" IN \(([^)]*)\)', context.captured_queries[1]["sql"]
+        )
+        self.assertEqual(
+            sorted(int(pk) for pk in ids.group(1).split(",")),
+            [article.pk for article in page],
+        )
+
+        with self.assertNumQueries(0):
+            for i, article in enumerate(page, 2):
+                self.assertEqual(article.title_fr, "%d in FR" % i)
+
+    def test_with_translations_iterator(self):
+        articles = self.articles
+
+        qs = Article.objects.with_translations().order_by("pk")
+
+        # 1 - SELECT ALL article
+        # 2, 3, 4, 5 - SELECT IN translation for each chunk of 3 articles
+        with self.assertNumQueries(5):
+            for i, article in enumerate(qs.iterator(chunk_size=3)):
+                self.assertEqual(article, articles[i])
+                self.assertEqual(article.title_fr, "%d in FR" % i)
+                self.assertEqual(article.content_en, "%d in EN" % i)
+
+        # Without chunks, translations are fetched once
+        with self.assertNumQueries(2):
+            self.assertEqual(len(list(qs)), 10)
+
+        # Without prefetching, nothing changes
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(Article.objects.iterator(chunk_size=3))), 10)
+
+    def test_with_translations_no_model_instances(self):
+        self.articles
+
+        instantiated = []
+
+        def count_instances(sender, instance, **kwargs):
+            instantiated.append(instance)
+
+        post_init.connect(count_instances, sender=Translation)
+        try:
+            articles = list(Article.objects.with_translations())
+        finally:
+            post_init.disconnect(count_instances, sender=Translation)
+
+        # Cache is built from rows, not from Translation instances
+        self.assertEqual(instantiated, [])
+
+        with self.assertNumQueries(0):
+            for article in articles:
+                cached = article._linguist.translations["title"]["fr"]
+                self.assertFalse(cached.is_new)
+                self.assertEqual(cached.identifier, "article")
+                self.assertEqual(cached.object_id, article.pk)
+                self.assertEqual(article.title_fr, "%s in FR" % article.slug[-1])
+
+    def test_auto_prefetch(self):
+        for i in range(20):
+            m = FooModel()
+            for language in self.languages:
+                m.activate_language(language)
+                m.title = "Title in %s" % language
+            m.save()
+
+        with mock.patch.object(settings, "AUTO_PREFETCH", True):
+            # 1 - SELECT ALL foomodel
+            # 2 - SELECT IN translation, on first cache miss
+            with self.assertNumQueries(2):
+                objs = list(FooModel.objects.order_by("pk")[:10])
+                for language in self.languages:
+                    translation.activate(language)
+                    for obj in objs:
+                        self.assertEqual(obj.title, "Title in %s" % language)
+
+            # Streaming: siblings are the instances of the same chunk
+            with self.assertNumQueries(3):
+                for obj in FooModel.objects.iterator(chunk_size=10):
+                    self.assertEqual(obj.title_fr, "Title in fr")
+
+            # Set values are saved as usual
+            obj = FooModel.objects.first()
+            obj.title_fr = "Titre"
+            obj.save()
+            self.assertEqual(FooModel.objects.get(pk=obj.pk).title_fr, "Titre")
+
+        translation.activate("en")
+
+    def test_auto_prefetch_duplicates(self):
+        article = self.articles[0]
+        tags = [Tag.objects.create(name="tag %d" % i) for i in range(2)]
+        article.tags.add(*tags)
+
+        with mock.patch.object(settings, "AUTO_PREFETCH", True):
+            # Same article twice, both instances are prefetched
+            objs = list(Article.objects.filter(tags__in=tags))
+            self.assertEqual([obj.pk for obj in objs], [article.pk] * 2)
+            with self.assertNumQueries(1):
+                self.assertEqual(objs[0].title_fr, "0 in FR")
+            with self.assertNumQueries(0):
+                self.assertEqual(objs[1].title_fr, "0 in FR")
+
+            # Sibling links are not pickled
+            obj = pickle.loads(pickle.dumps(Article.objects.get(pk=article.pk)))
+            with self.assertNumQueries(1):
+                self.assertEqual(obj.title_fr, "0 in FR")
+
+    def test_prefetch_languages(self):
+        for i in range(5):
+            m = FooModel()
+            for language in self.languages:
+                m.activate_language(language)
+                m.title = "Title in %s" % language
+            m.save()
+
+        translation.activate("fr")
+
+        with mock.patch.object(settings, "PREFETCH_LANGUAGES", "active+fallback"):
+            # 1 - SELECT ALL foomodel
+            # 2 - SELECT IN translation, for active and default languages only
+            with CaptureQueriesContext(connection) as ctx:
+                objs = list(FooModel.objects.order_by("pk").with_translations())
+            self.assertEqual(len(ctx.captured_queries), 2)
+            sql = ctx.captured_queries[1]["sql"]
+            self.assertIn("'fr'", sql)
+            self.assertIn("'en'", sql)
+            self.assertNotIn("'it'", sql)
+
+            with self.assertNumQueries(0):
+                for obj in objs:
+                    self.assertEqual(obj.title, "Title in fr")
+                    self.assertEqual(obj.title_en, "Title in en")
+
+            # Other languages are loaded on demand, not cached as empty
+            with self.assertNumQueries(1):
+                self.assertEqual(objs[0].title_it, "Title in it")
+
+        translation.activate("en")
+
+    def test_with_translations_related(self):
+        authors = [
+            Author.objects.create(
+                name="Author %d" % i, bio_en="Bio %d" % i, bio_fr="Bio fr %d" % i
+            )
+            for i in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name_en="Tag %d" % i, name_fr="Tag fr %d" % i)
+            for i in range(3)
+        ]
+        for i in range(6):
+            article = Article.objects.create(
+                author=authors[i % 3],
+                slug="related-%d" % i,
+                title_en="Title %d" % i,
+                title_fr="Titre %d" % i,
+            )
+            article.tags.add(*tags[: i % 3 + 1])
+
+        # 1 - SELECT ALL article
+        # 2 - SELECT IN translation (articles)
+        # 3 - SELECT IN author
+        # 4 - SELECT IN translation (authors)
+        # 5 - SELECT IN tag
+        # 6 - SELECT IN translation (tags)
+        with self.assertNumQueries(6):
+            articles = list(
+                Article.objects.with_translations(related=["author", "tags"])
+            )
+
+        with self.assertNumQueries(0):
+            for article in articles:
+                self.assertTrue(article.title_fr.startswith("Titre"))
+                self.assertTrue(article.author.bio_fr.startswith("Bio fr"))
+                for tag in article.tags.all():
+                    self.assertTrue(tag.name_fr.startswith("Tag fr"))
+
+        # One query per relation level, whatever the number of rows
+        with self.assertNumQueries(6):
+            tags = list(
+                Tag.objects.prefetch_related("article_set").with_translations(
+                    related=["article_set__author"]
+                )
+            )
+
+        with self.assertNumQueries(0):
+            for tag in tags:
+                self.assertTrue(tag.name_en.startswith("Tag"))
+                for article in tag.article_set.all():
+                    self.assertTrue(article.title_en.startswith("Title"))
+                    self.assertTrue(article.author.bio_en.startswith("Bio"))
+
+        # Also works on a list of instances
+        articles = list(Article.objects.all())
+        # 1 - SELECT IN author
+        # 2 - SELECT IN translation (authors)
+        # 3 - SELECT IN translation (articles)
+        with self.assertNumQueries(3):
+            prefetch_translations(articles, related=["author"])
+        with self.assertNumQueries(0):
+            for article in articles:
+                self.assertTrue(article.author.bio_fr.startswith("Bio fr"))
@@ -1,19 +1,32 @@
+import asyncio
+import threading
+
+from unittest import mock
+
 from django.utils import translation
 
 from exam import before
 
+from .. import override
 from .. import settings
-from ..fields import TranslationField
+from .. import utils
+from ..cache import CachedTranslation
+from ..fields import Linguist, TranslationField
+from ..helpers import prefetch_translations
+from ..languages import compile_fallback_languages
 from ..models import Translation
 
 from .base import BaseTestCase
 
 from .models import (
+    Article,
+    Author,
     FooModel,
     DefaultLanguageFieldModel,
     DefaultLanguageFieldModelWithCallable,
     CustomTranslationModel,
     DeciderModel,
+    Tag,
 )
 
 
@@ -296,6 +309,100 @@ class ModelMixinTest(BaseTestCase):
             self.assertEqual(self.instance._linguist.language, "de")
         self.assertEqual(self.instance._linguist.language, "fr")
 
+    def test_override_language_restored_on_error(self):
+        self.instance.activate_language("fr")
+        with self.assertRaises(ValueError):
+            with self.instance.override_language("de"):
+                raise ValueError()
+        self.assertEqual(self.instance._linguist.language, "fr")
+
+    def test_override(self):
+        instance = FooModel.objects.with_translations().get(
+            pk=self.translated_instance.pk
+        )
+        instance.activate_language("en")
+
+        with self.assertNumQueries(0):
+            with override("fr"):
+                self.assertEqual(instance.title, "fr")
+                self.assertEqual(instance.active_language, "fr")
+                with override("it"):
+                    self.assertEqual(instance.title, "it")
+                self.assertEqual(instance.title, "fr")
+                with override(None):
+                    self.assertEqual(instance.title, "en")
+
+            self.assertEqual(instance.title, "en")
+
+            @override("de")
+            def get_title(obj):
+                return obj.title
+
+            self.assertEqual(get_title(instance), "de")
+            self.assertEqual(instance.title, "en")
+
+        # Instances are not touched
+        self.assertEqual(instance._linguist._language, "en")
+
+        with self.assertRaises(ValueError):
+            with override("fr"):
+                raise ValueError()
+        self.assertEqual(instance.active_language, "en")
+
+        # Django language codes are resolved
+        with override("fr-FR"):
+            self.assertEqual(instance.title, "fr")
+        with override("xx"):
+            self.assertEqual(instance.title, "en")
+
+    def test_override_isolation(self):
+        instance = FooModel.objects.with_translations().get(
+            pk=self.translated_instance.pk
+        )
+
+        async def get_titles(language):
+            titles = []
+            with override(language):
+                for i in range(5):
+                    titles.append(instance.title)
+                    # Lets other tasks switch language
+                    await asyncio.sleep(0)
+            return titles
+
+        async def main():
+            return await asyncio.gather(
+                get_titles("fr"), get_titles("de"), get_titles(None)
+            )
+
+        instance.activate_language("en")
+        fr, de, default = asyncio.run(main())
+
+        self.assertEqual(fr, ["fr"] * 5)
+        self.assertEqual(de, ["de"] * 5)
+        self.assertEqual(default, ["en"] * 5)
+
+        # Threads don't see each other overrides either
+        results = []
+        barrier = threading.Barrier(10)
+
+        def get_title(language):
+            with override(language):
+                barrier.wait()
+                results.append((language, instance.title))
+
+        threads = [
+            threading.Thread(target=get_title, args=(("fr", "de")[i % 2],))
+            for i in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 10)
+        for language, title in results:
+            self.assertEqual(title, language)
+
     def test_instance_cache_only(self):
         self.assertRaises(TypeError, FooModel._linguist)
         for i in range(10):
@@ -394,6 +501,50 @@ class ModelMixinTest(BaseTestCase):
 
         translation.activate(saved_lang)
 
+    def test_fallback_languages(self):
+        m = FooModel(title_en="hello", title_de="hallo", body_it="corpo")
+        m.save()
+
+        fallback_languages = compile_fallback_languages(
+            {"fr": ["it", "de"]}, default_language="en"
+        )
+
+        with mock.patch.object(
+            FooModel._linguist, "fallback_languages", fallback_languages
+        ):
+            instance = FooModel.objects.get(pk=m.pk)
+            instance.activate_language("fr")
+            self.assertEqual(
+                instance._linguist.get_fallback_languages(), ("fr", "it", "de", "en")
+            )
+
+            # 1 - SELECT translations in "fr", "it", "de" and "en"
+            with self.assertNumQueries(1):
+                self.assertEqual(instance.title, "hallo")
+                self.assertEqual(instance.body, "corpo")
+                self.assertEqual(instance.excerpt, "")
+
+            # Without fallback languages, default language is used
+            instance.activate_language("es")
+            with self.assertNumQueries(1):
+                self.assertEqual(instance.title, "hello")
+
+            # Prefetched translations resolve chains without query
+            instances = list(FooModel.objects.with_translations().filter(pk=m.pk))
+            instances[0].activate_language("fr")
+            with self.assertNumQueries(0):
+                self.assertEqual(instances[0].title, "hallo")
+
+            # Languages after the first cached value are not loaded
+            instance = FooModel.objects.get(pk=m.pk)
+            instance.prefetch_translations(languages=["it"])
+            instance.activate_language("fr")
+            with mock.patch.object(
+                Linguist, "prefetch_languages", autospec=True
+            ) as prefetch_languages:
+                self.assertEqual(instance.body, "corpo")
+            self.assertFalse(prefetch_languages.called)
+
     def test_prefetch_translations(self):
         article = self.articles[0]
 
@@ -420,7 +571,10 @@ class ModelMixinTest(BaseTestCase):
         m = FooModel()
         m.save()
         m.prefetch_translations()
-        self.assertEqual(m.cached_translations_count, 18)
+        self.assertEqual(m.cached_translations_count, 0)
+        self.assertIsNone(m._linguist.translations.values)
+        with self.assertNumQueries(0):
+            self.assertEqual(m.title_fr, "")
 
     def test_prefetch_translations_parameters(self):
         article = self.articles[0]
@@ -438,9 +592,11 @@ class ModelMixinTest(BaseTestCase):
             for language in ("fr", "en"):
                 getattr(article, "title_%s" % language)
 
-        with self.assertNumQueries(0):
-            for language in ("fr", "en"):
-                self.assertEqual(getattr(article, "content_%s" % language), "")
+        # Fields left out are not known to be missing: loaded on demand
+        self.assertEqual(article._linguist.loaded_languages, set())
+        with self.assertNumQueries(2):
+            self.assertEqual(article.content_fr, "0 FR")
+            self.assertEqual(article.content_en, "0 in EN")
 
         #
         # prefetch_translations(populate_missing=True)
@@ -488,6 +644,28 @@ class ModelMixinTest(BaseTestCase):
             for language in ("fr", "en"):
                 getattr(article, "title_%s" % language)
 
+    def test_prefetch_mixed_translations(self):
+        decider = DeciderModel.objects.create(title_en="Decider", title_fr="Décideur")
+        instances = [Article.objects.get(pk=article.pk) for article in self.articles]
+        instances += [
+            Author.objects.get(pk=self.author.pk),
+            Tag.objects.get(pk=self.tag.pk),
+            DeciderModel.objects.get(pk=decider.pk),
+        ]
+
+        # 1 - SELECT translation (articles, author and tag)
+        # 2 - SELECT customtranslationmodel (decider)
+        with self.assertNumQueries(2):
+            prefetch_translations(instances)
+
+        # Rows with the same object_id are routed to the right model
+        with self.assertNumQueries(0):
+            for i, article in enumerate(instances[:10]):
+                self.assertEqual(article.title_fr, "%d in FR" % i)
+            self.assertEqual(instances[10].bio_fr, "Je suis John Doe")
+            self.assertEqual(instances[11].name_en, "tag en")
+            self.assertEqual(instances[12].title_fr, "Décideur")
+
     def test_get_field_object(self):
         field = self.translated_instance.get_field_object("title", "en")
         assert TranslationField in field.__class__.__mro__
@@ -499,3 +677,100 @@ class ModelMixinTest(BaseTestCase):
         self.assertRaises(
             KeyError, self.translated_instance.get_field_object, "description", "en"
         )
+
+    def test_hydrate_cache(self):
+        article = self.articles[0]
+        translations = utils.get_grouped_translations([article])[article.pk]
+        self.assertEqual(len(translations), 4)
+
+        # One entry per row, missing fields/languages are only flagged
+        # as known to be missing, neither objects nor entries.
+        for rows in (translations[:1], translations):
+            article.clear_translations_cache()
+            with mock.patch.object(
+                CachedTranslation, "__init__", return_value=None
+            ) as init:
+                with self.assertNumQueries(0):
+                    article._linguist.hydrate_cache(rows)
+            self.assertEqual(init.call_count, 0)
+            self.assertEqual(article.cached_translations_count, len(rows))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(article.title_fr, "0 in FR")
+            self.assertEqual(article.content_en, "0 in EN")
+
+        # Without populating missing translations
+        article.clear_translations_cache()
+        article._linguist.hydrate_cache(translations, populate_missing=False)
+        self.assertEqual(article.cached_translations_count, 4)
+
+    def test_prefetch_on_miss(self):
+        m = FooModel()
+        for language in ("en", "fr", "de"):
+            m.activate_language(language)
+            m.title = "Title in %s" % language
+            m.body = "Body in %s" % language
+        m.save()
+
+        with mock.patch.object(settings, "PREFETCH_ON_MISS", "all"):
+            instance = FooModel.objects.get(pk=m.pk)
+
+            # 1 - SELECT all translations of the instance
+            with self.assertNumQueries(1):
+                for language in self.languages:
+                    instance.activate_language(language)
+                    for field in instance.translatable_fields:
+                        getattr(instance, field)
+
+            self.assertEqual(instance.title_de, "Title in de")
+            self.assertEqual(instance.excerpt_fr, "")
+
+            # Cleared cache starts cold again
+            instance.clear_translations_cache()
+            with self.assertNumQueries(1):
+                self.assertEqual(instance.body_fr, "Body in fr")
+                self.assertEqual(instance.title_it, "")
+
+        # Dashed languages are loaded with their settings code
+        languages = list(settings.SUPPORTED_LANGUAGES) + [("pt-br", "Brazilian")]
+        Translation.objects.create(
+            identifier=m.linguist_identifier,
+            object_id=m.pk,
+            language="pt-br",
+            field_name="title",
+            field_value="Title in pt-br",
+        )
+        with mock.patch.object(settings, "PREFETCH_ON_MISS", "all"):
+            with mock.patch.object(settings, "SUPPORTED_LANGUAGES", languages):
+                instance = FooModel.objects.get(pk=m.pk)
+                with self.assertNumQueries(1):
+                    self.assertEqual(
+                        instance._linguist.get_value("title", "pt-br"),
+                        "Title in pt-br",
+                    )
+                    self.assertEqual(
+                        instance._linguist.get_value("body", "pt-br"), None
+                    )
+                self.assertIn("pt-br", instance._linguist.loaded_languages)
+
+        with mock.patch.object(settings, "PREFETCH_ON_MISS", "active+fallback"):
+            translation.activate("fr")
+            instance = FooModel.objects.get(pk=m.pk)
+
+            # 1 - SELECT translations in "fr" and "en"
+            with self.assertNumQueries(1):
+                for field in instance.translatable_fields:
+                    getattr(instance, field)
+                    getattr(instance, "%s_en" % field)
+            self.assertEqual(instance.title, "Title in fr")
+            self.assertEqual(instance._linguist.loaded_languages, set(["fr", "en"]))
+
+            # Other languages are loaded on demand
+            with self.assertNumQueries(1):
+                self.assertEqual(instance.title_de, "Title in de")
+                self.assertEqual(instance.body_de, "Body in de")
+
+            # Set values are saved as usual
+            instance.title_it = "Titolo"
+            instance.save()
+            self.assertEqual(FooModel.objects.get(pk=m.pk).title_it, "Titolo")
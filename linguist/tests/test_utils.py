@@ -2,13 +2,20 @@
 from __future__ import unicode_literals
 
 import json
+import threading
 
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
 from django.utils import translation
 
 from .. import settings
 from .. import utils
+from ..languages import compile_fallback_languages, get_registry
 
-from .base import BaseTestCase
+from .base import BaseTestCase, BaseTransactionTestCase
+from .models import FooModel, SlugModel
 
 
 class UtilsTest(BaseTestCase):
@@ -37,6 +44,25 @@ class UtilsTest(BaseTestCase):
         self.assertEqual(utils.get_fallback_language(), "en")
         self.assertEqual(utils.get_language(), utils.get_fallback_language())
 
+    def test_get_prefetch_languages(self):
+        self.assertIsNone(utils.get_prefetch_languages(None))
+        self.assertIsNone(utils.get_prefetch_languages("all"))
+
+        translation.activate("fr")
+        self.assertEqual(
+            utils.get_prefetch_languages("active+fallback"),
+            ["fr", settings.DEFAULT_LANGUAGE],
+        )
+
+        # Typos are not silently treated as "all"
+        with self.assertRaises(ImproperlyConfigured):
+            utils.get_prefetch_languages("active+fallbacks")
+
+        instance = FooModel.objects.get(pk=self.translated_instance.pk)
+        with mock.patch.object(settings, "PREFETCH_ON_MISS", "any"):
+            with self.assertRaises(ImproperlyConfigured):
+                instance.title_fr
+
     def test_get_fallback_language(self):
         self.assertEqual(utils.get_fallback_language(), settings.DEFAULT_LANGUAGE)
 
@@ -101,3 +127,161 @@ class UtilsTest(BaseTestCase):
             lookup = utils.get_translation_lookup("foo", k, "value")
             lookup = json.loads(json.dumps(lookup, sort_keys=True))
             self.assertEqual(lookup, expected[k])
+
+
+class Rows(list):
+    """
+    Translations queryset stand-in for ``fetch_translations()``.
+    """
+
+    db = "default"
+
+
+class FetchTranslationsTest(BaseTestCase):
+    """
+    Tests concurrent translations fetching.
+    """
+
+    def test_transaction_fallback(self):
+        instance = self.translated_instance
+        instances = [instance] + [FooModel.objects.create() for i in range(3)]
+
+        # Rows written in the current transaction are only visible from
+        # its connection: chunks are fetched serially.
+        with mock.patch.object(utils, "ThreadPoolExecutor") as executor:
+            translations = utils.get_grouped_translations(
+                instances, chunks_length=1, workers=4
+            )
+
+        self.assertFalse(executor.called)
+        self.assertEqual(len(translations[instance.pk]), len(self.languages))
+
+    def test_workers(self):
+        querysets = [Rows([i, i + 10]) for i in range(6)]
+        connections = mock.MagicMock()
+        connections.__getitem__.return_value.in_atomic_block = False
+
+        with mock.patch.object(utils, "connections", connections):
+            rows = list(utils.fetch_translations(querysets, workers=3))
+
+        # Rows are returned in querysets order
+        self.assertEqual(rows, [row for rows in querysets for row in rows])
+
+        # Connections are closed once per worker thread
+        self.assertEqual(connections.__getitem__.return_value.close.call_count, 3)
+
+
+class ParallelFetchTranslationsTest(BaseTransactionTestCase):
+    """
+    Tests translations fetching with worker threads (committed rows).
+    """
+
+    def test_parallel_grouped_translations(self):
+        instances = []
+        for i in range(10):
+            instance = SlugModel(slug="slug-%d" % i)
+            for language in ("en", "fr"):
+                instance.activate_language(language)
+                instance.title = "Title %d in %s" % (i, language)
+            instance.save()
+            instances.append(instance)
+
+        serial = utils.get_grouped_translations(instances, chunks_length=3)
+
+        closed = []
+        wrapper_class = connections["default"].__class__
+        close = wrapper_class.close
+
+        def record_close(wrapper):
+            closed.append(threading.get_ident())
+            close(wrapper)
+
+        with mock.patch.object(
+            wrapper_class, "close", autospec=True, side_effect=record_close
+        ):
+            parallel = utils.get_grouped_translations(
+                instances, chunks_length=3, workers=4
+            )
+
+        self.assertEqual(len(parallel), 10)
+        for instance in instances:
+            self.assertEqual(
+                sorted(str(t) for t in parallel[instance.pk]),
+                sorted(str(t) for t in serial[instance.pk]),
+            )
+
+        # 4 chunks, 4 workers each closing its thread connection once, the
+        # caller connection is left open
+        self.assertEqual(len(closed), 4)
+        self.assertNotIn(threading.get_ident(), closed)
+
+
+class CountingList(list):
+    """
+    List counting its iterations.
+    """
+
+    iterations = 0
+
+    def __iter__(self):
+        self.iterations += 1
+        return super(CountingList, self).__iter__()
+
+
+class LanguageRegistryTest(BaseTestCase):
+    """
+    Tests languages registry.
+    """
+
+    def test_registry(self):
+        languages = [("en", "English"), ("fr-ca", "Canadian French")]
+
+        with mock.patch.object(settings, "SUPPORTED_LANGUAGES", languages):
+            registry = get_registry()
+            self.assertEqual(registry.supported, ("en", "fr_ca"))
+            self.assertEqual(registry.supported_set, frozenset(["en", "fr_ca"]))
+            self.assertEqual(registry.ordinals, {"en": 0, "fr_ca": 1})
+            self.assertEqual(registry.normalize("fr-ca"), "fr_ca")
+            self.assertEqual(registry.denormalized["fr_ca"], "fr-ca")
+            self.assertEqual(registry.resolve("fr-ca"), "fr-ca")
+            self.assertEqual(registry.resolve("en-us"), "en")
+            self.assertEqual(registry.resolve("ru"), settings.DEFAULT_LANGUAGE)
+            self.assertEqual(registry.resolved["en-us"], "en")
+
+            # Built once
+            self.assertIs(get_registry(), registry)
+
+        # Rebuilt when settings change
+        self.assertIsNot(get_registry(), registry)
+        self.assertEqual(get_registry().supported, tuple(self.languages))
+
+    def test_compile_fallback_languages(self):
+        chains = compile_fallback_languages(
+            {"fr": ["it", "de"], "it": ["es"], "es": "fr"}, default_language="en"
+        )
+
+        self.assertEqual(chains["fr"], ("fr", "it", "es", "de", "en"))
+        self.assertEqual(chains["es"], ("es", "fr", "it", "de", "en"))
+        self.assertEqual(chains["en"], ("en",))
+        self.assertEqual(chains["pt"], ("pt", "en"))
+
+        with self.assertRaises(ImproperlyConfigured):
+            compile_fallback_languages({"fr": ["xx"]})
+
+    def test_getter_languages_lookups(self):
+        instance = self.translated_instance
+        instance._linguist.language = None
+        languages = CountingList(settings.SUPPORTED_LANGUAGES)
+
+        # Django active language lookup is left out
+        with mock.patch.object(settings, "SUPPORTED_LANGUAGES", languages):
+            with mock.patch.object(utils, "_get_language", lambda: "fr"):
+                # Registry rebuilt for the new settings
+                self.assertEqual(instance.title, "fr")
+                languages.iterations = 0
+
+                # Supported languages are not looked up per access
+                for i in range(10):
+                    self.assertEqual(instance.title, "fr")
+                    self.assertEqual(instance.title_de, "de")
+                self.assertEqual(languages.iterations, 0)
@@ -1,18 +1,31 @@
 # -*- coding: utf-8 -*-
-import copy
+import functools
 import itertools
+import operator
 import collections
+import queue
+import warnings
 
+from concurrent.futures import ThreadPoolExecutor
 from importlib import import_module
 
-from django.db.models import QuerySet
+from django.db import connections
+from django.db.models import Q, QuerySet
 from django.core import exceptions
 from django.utils.encoding import force_str
 from django.utils.functional import lazy
 from django.utils.translation import get_language as _get_language
 
 from . import settings
-
+from .cache import (
+    CachedTranslation,
+    get_cached_translations,
+    get_translation_field_names,
+    has_translations_cache,
+    refill_translations,
+)
+from .context import get_override_language
+from .languages import get_registry
 
 collections_abc = getattr(collections, "abc", collections)
 
@@ -22,12 +35,12 @@ CLASS_PATH_ERROR = (
     "('path.to.models.Class', 'app_label')."
 )
 
+# Prefetch languages policies (PREFETCH_ON_MISS / PREFETCH_LANGUAGES settings)
+PREFETCH_POLICIES = (None, "all", "active+fallback")
+
 
 def get_language_name(code):
-    languages = dict(
-        (lang_code, lang_name) for lang_code, lang_name in settings.SUPPORTED_LANGUAGES
-    )
-    return languages.get(code)
+    return get_registry().names.get(code)
 
 
 def get_language():
@@ -40,14 +53,7 @@ def get_language():
     if not lang:
         return get_fallback_language()
 
-    langs = [l[0] for l in settings.SUPPORTED_LANGUAGES]
-    if lang not in langs and "-" in lang:
-        lang = lang.split("-")[0]
-
-    if lang in langs:
-        return lang
-
-    return settings.DEFAULT_LANGUAGE
+    return get_registry().resolve(lang)
 
 
 def get_fallback_language():
@@ -57,10 +63,48 @@ def get_fallback_language():
     return settings.DEFAULT_LANGUAGE
 
 
+def check_prefetch_policy(policy, setting_name=None):
+    """
+    Raises ``ImproperlyConfigured`` if the given prefetch languages policy
+    is unknown.
+    """
+    if policy not in PREFETCH_POLICIES:
+        raise exceptions.ImproperlyConfigured(
+            "%sunknown prefetch languages policy %r, expected one of: %s"
+            % (
+                "%s: " % setting_name if setting_name else "",
+                policy,
+                ", ".join(repr(p) for p in PREFETCH_POLICIES),
+            )
+        )
+
+
+def get_prefetch_languages(policy, instance=None):
+    """
+    Returns the list of languages to prefetch for the given policy:
+    ``None`` (all languages) for ``"all"``, the active language and its
+    fallback languages for ``"active+fallback"``.
+    """
+    check_prefetch_policy(policy)
+
+    if policy != "active+fallback":
+        return None
+
+    if instance is not None:
+        languages = instance._linguist.get_fallback_languages()
+    else:
+        languages = [
+            get_override_language() or get_language(),
+            get_fallback_language(),
+        ]
+
+    return list(collections.OrderedDict.fromkeys(languages))
+
+
 def get_real_field_name(field, lang=None):
     if lang is None:
         lang = get_language()
-    return str("%s_%s" % (field, lang.replace("-", "_")))
+    return str("%s_%s" % (field, get_registry().normalize(lang)))
 
 
 def get_fallback_field_name(field):
@@ -71,7 +115,7 @@ def get_supported_languages():
     """
     Returns supported languages list.
     """
-    return [code.replace("-", "_") for code, name in settings.SUPPORTED_LANGUAGES]
+    return list(get_registry().supported)
 
 
 def get_language_fields(fields):
@@ -79,9 +123,7 @@ def get_language_fields(fields):
     Takes a list of fields and returns related language fields.
     """
     return [
-        "%s_%s" % (field, lang)
-        for field in fields
-        for lang in get_supported_languages()
+        "%s_%s" % (field, lang) for field in fields for lang in get_registry().supported
     ]
 
 
@@ -90,7 +132,9 @@ def activate_language(instances, language):
     Activates the given language for the given instances.
     """
     language = (
-        language if language in get_supported_languages() else get_fallback_language()
+        language
+        if language in get_registry().supported_set
+        else get_fallback_language()
     )
     for instance in instances:
         instance.activate_language(language)
@@ -103,7 +147,7 @@ def build_localized_field_name(field_name, language=None):
     if language is None:
         language = get_language()
 
-    return "%s_%s" % (field_name, language.replace("-", "_"))
+    return "%s_%s" % (field_name, get_registry().normalize(language))
 
 
 def _build_localized_verbose_name(verbose_name, language):
@@ -232,9 +276,8 @@ def get_translation_lookup(identifier, field, value):
 
     name_parts = parts[0].split("_")
     if len(name_parts) > 1:
-        supported_languages = get_supported_languages()
         last_part = name_parts[-1]
-        if last_part in supported_languages:
+        if last_part in get_registry().supported_set:
             # title_with_underscore_fr?
             field_name = "_".join(name_parts[:-1])
             language = last_part
@@ -263,10 +306,172 @@ def get_field_name_from_lookup(lookup):
     return lookup.split("__")[0]
 
 
+def _fetch_translations(pending, db):
+    """
+    Worker thread: evaluates translations querysets taken from ``pending``
+    (``(index, queryset)`` queue) until it is empty, then closes the
+    connection the thread opened.
+    """
+    results = []
+
+    try:
+        while True:
+            try:
+                index, queryset = pending.get_nowait()
+            except queue.Empty:
+                return results
+            results.append((index, list(queryset)))
+    finally:
+        connections[db].close()
+
+
+def get_translations_lookup(**kwargs):
+    """
+    Returns the translations lookup for the ``field_names`` and ``languages``
+    prefetch parameters.
+    """
+    lookup = {}
+
+    for kwarg in ("field_names", "languages"):
+        value = kwargs.get(kwarg, None)
+        if value is not None:
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            lookup["%s__in" % kwarg[:-1]] = value
+
+    return lookup
+
+
+def fetch_translations(querysets, workers=None):
+    """
+    Returns an iterable over the rows of the given translations querysets,
+    evaluated concurrently with ``workers`` threads if greater than one.
+
+    Querysets are evaluated serially inside a transaction: worker threads
+    use their own connections, which can't see uncommitted rows.
+    """
+    if not (workers and workers > 1 and len(querysets) > 1):
+        return itertools.chain.from_iterable(querysets)
+
+    db = querysets[0].db
+
+    # Other connections can't see rows written in the current transaction
+    if connections[db].in_atomic_block:
+        return itertools.chain.from_iterable(querysets)
+
+    pending = queue.Queue()
+    for index, queryset in enumerate(querysets):
+        pending.put((index, queryset))
+
+    workers = min(workers, len(querysets))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_fetch_translations, pending, db) for i in range(workers)
+        ]
+        results = sorted(
+            itertools.chain.from_iterable(future.result() for future in futures),
+            key=operator.itemgetter(0),
+        )
+
+    return itertools.chain.from_iterable(rows for index, rows in results)
+
+
+def get_decider_translations(decider, identifiers, **kwargs):
+    """
+    Returns translations rows (``values_list()`` rows) of the given objects
+    (``{identifier: [object_id, ...]}``) stored in ``decider``.
+
+    Rows are read through the local and shared caches if enabled, then
+    fetched from the database in a single query (or one query per chunk of
+    ``chunks_length`` IDs), with one ``OR`` condition per identifier.
+
+    Cache refills are single-flight: objects being refilled by another
+    caller are waited for instead of being fetched again.
+    """
+    field_names = kwargs.get("field_names", None)
+
+    # Rows store language codes as defined in settings ("pt-br")
+    registry = get_registry()
+    languages = kwargs.get("languages", None)
+    if languages is None:
+        languages = list(registry.codes)
+    else:
+        if not isinstance(languages, (list, tuple)):
+            languages = [languages]
+        languages = [registry.denormalize(language) for language in languages]
+        kwargs = dict(kwargs, languages=languages)
+
+    if field_names is not None and not isinstance(field_names, (list, tuple)):
+        field_names = [field_names]
+
+    objects = [
+        (identifier, object_id)
+        for identifier, instances_ids in identifiers.items()
+        for object_id in instances_ids
+    ]
+
+    cached = get_cached_translations(decider, objects, languages)
+    missing = [obj for obj in objects if obj not in cached]
+
+    def fetch(objects):
+        return query_translations(decider, objects, **kwargs)
+
+    if missing and has_translations_cache() and field_names is None:
+        refilled, translations = refill_translations(decider, missing, languages, fetch)
+        cached.update(refilled)
+    elif missing:
+        translations = fetch(missing)
+    else:
+        translations = []
+
+    field_name_index = get_translation_field_names().index("field_name")
+    rows = [
+        row
+        for languages_rows in cached.values()
+        for language in languages
+        for row in languages_rows[language]
+        if field_names is None or row[field_name_index] in field_names
+    ]
+
+    return itertools.chain(rows, translations)
+
+
+def query_translations(decider, objects, **kwargs):
+    """
+    Fetches translations rows of the given objects (``(identifier,
+    object_id)`` tuples) stored in ``decider`` from the database.
+    """
+    chunks_length = kwargs.get("chunks_length", None)
+    workers = kwargs.get("workers", settings.PREFETCH_WORKERS)
+    fields = get_translation_field_names()
+    lookup = get_translations_lookup(**kwargs)
+
+    identifiers = collections.OrderedDict()
+    for identifier, object_id in objects:
+        identifiers.setdefault(identifier, []).append(object_id)
+
+    conditions = [
+        Q(identifier=identifier, object_id__in=ids)
+        for identifier, instances_ids in identifiers.items()
+        for ids in chunks(instances_ids, chunks_length or len(instances_ids))
+    ]
+
+    if chunks_length is None:
+        conditions = [functools.reduce(operator.or_, conditions)]
+
+    translations_qs = [
+        decider.objects.filter(condition, **lookup).values_list(*fields)
+        for condition in conditions
+    ]
+
+    return fetch_translations(translations_qs, workers)
+
+
 def get_grouped_translations(instances, **kwargs):
     """
     Takes instances and returns grouped translations ready to
-    be set in cache.
+    be set in cache (``CachedTranslation`` built from database rows).
     """
     grouped_translations = collections.defaultdict(list)
 
@@ -295,40 +500,65 @@ def get_grouped_translations(instances, **kwargs):
 
     decider = model._meta.linguist.get("decider", Translation)
     identifier = model._meta.linguist.get("identifier", None)
-    chunks_length = kwargs.get("chunks_length", None)
 
     if identifier is None:
         raise Exception('You must define Linguist "identifier" meta option')
 
-    lookup = dict(identifier=identifier)
-    for kwarg in ("field_names", "languages"):
-        value = kwargs.get(kwarg, None)
-        if value is not None:
-            if not isinstance(value, (list, tuple)):
-                value = [value]
-            lookup["%s__in" % kwarg[:-1]] = value
-
-    if chunks_length is not None:
-        translations_qs = []
-        for ids in chunks(instances_ids, chunks_length):
-            ids_lookup = copy.copy(lookup)
-            ids_lookup["object_id__in"] = ids
-            translations_qs.append(decider.objects.filter(**ids_lookup))
-        translations = itertools.chain.from_iterable(translations_qs)
-    else:
-        lookup["object_id__in"] = instances_ids
-        translations = decider.objects.filter(**lookup)
+    translations = get_decider_translations(
+        decider, {identifier: instances_ids}, **kwargs
+    )
 
-    for translation in translations:
+    for values in translations:
+        translation = CachedTranslation.from_values(values)
         grouped_translations[translation.object_id].append(translation)
 
     return grouped_translations
 
 
+def get_mixed_grouped_translations(instances, **kwargs):
+    """
+    Takes instances of any Linguist models and returns translations grouped
+    by ``(identifier, object_id)``.
+
+    Instances are grouped by decider: translations of all the models sharing
+    a decider are fetched in a single query (or one query per chunk of
+    ``chunks_length`` IDs), with one ``OR`` condition per identifier.
+    """
+    grouped_translations = collections.defaultdict(list)
+
+    deciders = collections.OrderedDict()
+
+    for instance in instances:
+        linguist = getattr(instance.__class__, "_linguist", None)
+        if linguist is None or instance.pk is None:
+            continue
+        identifiers = deciders.setdefault(linguist.decider, collections.OrderedDict())
+        identifiers.setdefault(linguist.identifier, []).append(instance.pk)
+
+    for decider, identifiers in deciders.items():
+        for values in get_decider_translations(decider, identifiers, **kwargs):
+            translation = CachedTranslation.from_values(values)
+            key = (translation.identifier, translation.object_id)
+            grouped_translations[key].append(translation)
+
+    return grouped_translations
+
+
 def set_object_translations_cache(obj, queryset):
-    obj.clear_translations_cache()
+    """
+    Deprecated: use ``helpers.prefetch_translations()``. Fills ``obj``
+    translations cache as ``queryset.with_translations()`` would do.
+    """
+    from .helpers import prefetch_translations
+
+    warnings.warn(
+        "set_object_translations_cache() is deprecated, "
+        "use linguist.helpers.prefetch_translations() instead.",
+        DeprecationWarning,
+        stacklevel=2,
+    )
 
-    if obj.pk in queryset._prefetched_translations_cache:
-        for translation in queryset._prefetched_translations_cache[obj.pk]:
-            obj._linguist.set_cache(instance=obj, translation=translation)
-            obj.populate_missing_translations()
+    obj.clear_translations_cache()
+    prefetch_translations(
+        [obj], **(getattr(queryset, "_prefetch_translations", None) or {})
+    )